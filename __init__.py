@@ -1,3 +1,21 @@
-from .models import ActiveExplore
-from .apps import ExploreML
-from .data import loadActiveH5
+import importlib
+
+# Imported on first access, so importing the package does not load bokeh, pandas or scipy
+_lazy = {'ActiveExplore':'.models', 'ExploreML':'.apps', 'loadActiveH5':'.data'}
+_submodules = ['models', 'apps', 'data', 'benchmarks']
+
+__all__ = list(_lazy)
+
+def __getattr__(name):
+    if name in _lazy:
+        value = getattr(importlib.import_module(_lazy[name], __name__), name)
+    elif name in _submodules:
+        value = importlib.import_module('.' + name, __name__)
+    else:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__) | set(_submodules))
@@ -1,27 +1,46 @@
 from exploreML.models import ActiveExplore
 from exploreML.models import PredictMap
+from exploreML.models.registry import SourceRegistry
+from exploreML.models.profiling import BuildProfiler
 from bokeh.layouts import column, row
 
 class ExploreML:
 
+    """
+    Args:
+    grid_shape: (rows, cols) grid of experiment panels, each panel is an ActiveExplore with its PredictMap,
+                at most rows*cols experiments can be added
+    share_sources: share identical sources and cluster orderings between the panels
+    profiler: BuildProfiler recording the build stages of every panel, see profiler.report()
+    """
 
-    def __init__(self,grid_shape=(1,1),**kwargs):
+    def __init__(self,grid_shape=(1,1),share_sources=True,profiler=None,**kwargs):
 
         self.grid_shape = grid_shape
-        self.layouts = []
+        self.panels = []
+        self.source_registry = SourceRegistry() if share_sources else None
+        self.profiler = profiler if profiler is not None else BuildProfiler(enabled=False)
         #maybe map_p_high/low
 
 
     def addActiveExplore(self,data_dict,sampling_dict,**kwargs):
 
-        active = ActiveExplore(data_dict, sampling_dict, **kwargs)
+        n_rows, n_cols = self.grid_shape
+        if len(self.panels) >= n_rows*n_cols:
+            raise ValueError('The {}x{} grid is full, increase grid_shape to add experiments'.format(n_rows, n_cols))
 
-        self.layouts += [active.layout]
+        kwargs.setdefault('source_registry', self.source_registry)
+        kwargs.setdefault('profiler', self.profiler)
+        with self.profiler.stage('ActiveExplore'):
+            active = ActiveExplore(data_dict, sampling_dict, **kwargs)
+
+        # Each experiment starts a new panel, its PredictMap is placed beside it
+        self.panels += [[active.layout]]
         self.toolbar = active.toolbar
         self.clust_dict = active.clust_dict # Index clusters for heatmap
+        self.clust_sources = active.clust_sources
         self.clust_methods = active.clust_methods
         self.upper_source = active.upper_source
-        self.upper_dict = active.upper_dict
         self.row_name = active.row_name
         self.col_name = active.col_name
         self.sample_sliders = active.sample_sliders
@@ -34,14 +53,24 @@ class ExploreML:
 
     def addPredictMap(self,pred_df,map_dict,**kwargs):
 
-        predict = PredictMap(pred_df, map_dict, toolbar=self.toolbar,
-                             clust_dict=self.clust_dict,clust_methods=self.clust_methods,
-                             upper_source=self.upper_source,upper_dict=self.upper_dict,
-                             row_name=self.row_name,col_name=self.col_name,
-                             radio_button_group=self.radio_button_group,toggle=self.toggle,
-                             sample_sliders=self.sample_sliders,plot_size=self.plot_size,
-                             data_toggle=self.data_toggle,active_dim=self.active_dim,**kwargs)
-        self.layouts += [predict.layout]
+        kwargs.setdefault('profiler', self.profiler)
+        with self.profiler.stage('PredictMap'):
+            predict = PredictMap(pred_df, map_dict, toolbar=self.toolbar,
+                                 clust_dict=self.clust_dict,clust_sources=self.clust_sources,
+                                 clust_methods=self.clust_methods,
+                                 upper_source=self.upper_source,
+                                 row_name=self.row_name,col_name=self.col_name,
+                                 radio_button_group=self.radio_button_group,toggle=self.toggle,
+                                 sample_sliders=self.sample_sliders,plot_size=self.plot_size,
+                                 data_toggle=self.data_toggle,active_dim=self.active_dim,**kwargs)
+        self.panels[-1] += [predict.layout]
 
     def Layout(self):
-        self.layout = row(*self.layouts)
+        n_rows, n_cols = self.grid_shape
+        if not self.panels:
+            raise ValueError('No panels to lay out, add an ActiveExplore first')
+
+        with self.profiler.stage('Layout'):
+            grid_rows = [row(*[layout for panel in self.panels[i:i+n_cols] for layout in panel])\
+                         for i in range(0, len(self.panels), n_cols)]
+            self.layout = grid_rows[0] if len(grid_rows) == 1 else column(*grid_rows)
@@ -0,0 +1,227 @@
+"""
+Browser side interaction latency of a saved dashboard, measured in headless Chromium with playwright
+
+Run from the directory containing exploreML, e.g.
+python -m exploreML.benchmarks.browser_latency --sizes 100x100 1000x1000
+python -m exploreML.benchmarks.browser_latency --html active_explorer.html
+python -m exploreML.benchmarks.browser_latency --check
+
+Requires playwright and its Chromium build (pip install playwright && playwright install chromium)
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+from .run_benchmarks import appendHistory, gitCommit, default_history
+from .synthetic import makeSyntheticExperiment
+
+# Sets a widget property, which runs its JS callbacks synchronously, then waits two frames for the repaint
+measure_js = """
+async ([name, attr, value]) => {
+  const models = [];
+  for (const doc of Bokeh.documents) {
+    for (const model of doc._all_models.values()) {
+      if (model.name == name) models.push(model);
+    }
+  }
+  if (models.length == 0) return null;
+
+  const start = performance.now();
+  models[0][attr] = value;
+  const callback = performance.now();
+  await new Promise(resolve => requestAnimationFrame(() => requestAnimationFrame(resolve)));
+  const frame = performance.now();
+
+  return {callback_ms: callback - start, frame_ms: frame - start,
+          heap_bytes: performance.memory ? performance.memory.usedJSHeapSize : null};
+}
+"""
+
+# Named widgets classified by model type, layouts such as slider_col share the name prefixes
+widgets_js = """
+() => {
+  const kinds = {Slider: 'slider', RadioGroup: 'radio', RadioButtonGroup: 'radio', Select: 'select', Toggle: 'toggle'};
+  const widgets = {};
+  for (const doc of Bokeh.documents) {
+    for (const model of doc._all_models.values()) {
+      const kind = kinds[model.type];
+      if (model.name == null || kind === undefined) continue;
+      if (kind == 'slider') widgets[model.name] = {kind: kind, start: model.start, end: model.end, step: model.step};
+      else if (kind == 'radio') widgets[model.name] = {kind: kind, n: model.labels.length};
+      else if (kind == 'select') widgets[model.name] = {kind: kind, options: model.options};
+      else widgets[model.name] = {kind: kind};
+    }
+  }
+  return widgets;
+}
+"""
+
+widget_kinds = {'Slider':'slider', 'RadioGroup':'radio', 'RadioButtonGroup':'radio', 'Select':'select', 'Toggle':'toggle'}
+
+def interactionValues(widget, n_steps=20):
+    """
+    (property, values) driven for a named widget
+    """
+    if widget['kind'] == 'slider':
+        values = np.linspace(widget['start'], widget['end'], n_steps)
+        values = np.round(values / widget['step']) * widget['step']
+        return 'value', [float(value) for value in values]
+    elif widget['kind'] == 'radio':
+        return 'active', list(range(widget['n'])) * 2
+    elif widget['kind'] == 'select':
+        return 'value', list(widget['options']) * 2
+    return 'active', [True, False] * 2
+
+def measurePage(url, n_steps=20, timeout=120000):
+    """
+    Latency of every interaction on a dashboard, one dict per widget with the callback and frame times in ms
+    """
+    try:
+        from playwright.sync_api import sync_playwright
+    except ImportError:
+        print('ImportError: playwright is required for the browser benchmarks (pip install playwright)')
+        return []
+
+    results = []
+    with sync_playwright() as pw:
+        browser = pw.chromium.launch(args=['--enable-precise-memory-info'])
+        page = browser.new_page()
+        page.goto(url, timeout=timeout)
+        page.wait_for_function("window.Bokeh !== undefined && Bokeh.documents.length > 0 && "
+                               "Bokeh.index !== undefined && Object.keys(Bokeh.index).length > 0", timeout=timeout)
+        heap_start = page.evaluate("performance.memory ? performance.memory.usedJSHeapSize : null")
+
+        for name, widget in page.evaluate(widgets_js).items():
+            attr, values = interactionValues(widget, n_steps)
+            samples = [page.evaluate(measure_js, [name, attr, value]) for value in values]
+            samples = [sample for sample in samples if sample is not None]
+            if not samples:
+                continue
+
+            callback_ms = np.array([sample['callback_ms'] for sample in samples])
+            frame_ms = np.array([sample['frame_ms'] for sample in samples])
+            heap = [sample['heap_bytes'] for sample in samples if sample['heap_bytes'] is not None]
+            results.append(dict(widget=name, kind=widget['kind'], n=len(samples),
+                                callback_ms_median=float(np.median(callback_ms)),
+                                callback_ms_p95=float(np.percentile(callback_ms, 95)),
+                                frame_ms_median=float(np.median(frame_ms)),
+                                frame_ms_p95=float(np.percentile(frame_ms, 95)),
+                                heap_bytes_max=max(heap) if heap else None,
+                                heap_bytes_start=heap_start))
+
+        browser.close()
+
+    return results
+
+def buildDashboard(fname, n_rows, n_cols, n_samplers=3, n_iters=1000, is_sym=False, step=120,
+                   active_options=None, predict_options=None, with_predict=False):
+    """
+    Save a synthetic dashboard to fname, ActiveExplore alone or with a standalone PredictMap
+    Returns the saved root layout
+    """
+    from bokeh.io import save, output_file
+    from exploreML.models import ActiveExplore
+    from exploreML.apps import ExploreML
+
+    data_dict, sampling_dict, pred_df, predmap_dict = makeSyntheticExperiment(n_rows, n_cols, n_samplers, n_iters,
+                                                                              is_sym, step)
+    names = dict(row_name='gene1', col_name='gene2', is_sym=is_sym, slider_step=step)
+
+    if not with_predict:
+        return ActiveExplore(data_dict, sampling_dict, url=fname, **names, **(active_options or {})).layout
+
+    explore = ExploreML()
+    explore.addActiveExplore(data_dict, sampling_dict, file_output=False, **names, **(active_options or {}))
+    explore.addPredictMap(pred_df, predmap_dict, is_sym=is_sym, standalone=True,
+                          mapdictInit=list(sampling_dict)[0], **(predict_options or {}))
+    explore.Layout()
+    output_file(filename=fname, title='benchmark')
+    save(explore.layout)
+
+    return explore.layout
+
+def expectedWidgets(layout):
+    """
+    {name: kind} of the named widgets of a layout that the harness should drive
+    """
+    return {model.name:widget_kinds[type(model).__name__] for model in layout.references()\
+            if model.name is not None and type(model).__name__ in widget_kinds}
+
+def checkHarness(n_steps=3):
+    """
+    Run the harness on a small ActiveExplore and PredictMap page, True when every named widget was driven
+    with its kind
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        fname = os.path.join(tmp_dir, 'check.html')
+        layout = buildDashboard(fname, 20, 20, n_samplers=2, n_iters=240, with_predict=True)
+        expected = expectedWidgets(layout)
+        measured = {result['widget']:result['kind'] for result in measurePage('file://' + fname, n_steps)}
+
+    wrong = {name:(kind, measured.get(name)) for name,kind in expected.items() if measured.get(name) != kind}
+    unexpected = sorted(set(measured) - set(expected))
+    for name,(kind,found) in wrong.items():
+        print('{}: expected {}, measured {}'.format(name, kind, found))
+    for name in unexpected:
+        print('{}: measured but not a widget'.format(name))
+
+    return not wrong and not unexpected
+
+def main(args=None):
+    import json
+
+    parser = argparse.ArgumentParser(description='Benchmark dashboard interactions in headless Chromium')
+    parser.add_argument('--html', help='saved dashboard to measure instead of synthetic ones')
+    parser.add_argument('--sizes', nargs='+', default=['100x100'], help='matrix sizes as ROWSxCOLS')
+    parser.add_argument('--samplers', type=int, default=3)
+    parser.add_argument('--iters', type=int, default=1000)
+    parser.add_argument('--step', type=int, default=120)
+    parser.add_argument('--sym', action='store_true')
+    parser.add_argument('--predict', action='store_true', help='include a standalone PredictMap')
+    parser.add_argument('--options', default='{}', help='JSON of extra ActiveExplore kwargs')
+    parser.add_argument('--predict-options', default='{}', help='JSON of extra PredictMap kwargs')
+    parser.add_argument('--n-steps', type=int, default=20, help='slider positions per slider')
+    parser.add_argument('--label', default='default')
+    parser.add_argument('--history', default=default_history, help='JSON history to append the results to')
+    parser.add_argument('--check', action='store_true', help='only check the harness on a small dashboard')
+    args = parser.parse_args(args)
+
+    if args.check:
+        passed = checkHarness()
+        print('harness check {}'.format('passed' if passed else 'failed'))
+        return 0 if passed else 1
+
+    active_options = json.loads(args.options)
+    predict_options = json.loads(args.predict_options)
+    base = dict(kind='browser', label=args.label, commit=gitCommit(), time=time.strftime('%Y-%m-%dT%H:%M:%S'))
+
+    records = []
+    if args.html:
+        runs = [(dict(html=args.html), os.path.abspath(args.html))]
+    else:
+        tmp_dir = tempfile.mkdtemp()
+        runs = []
+        for size in args.sizes:
+            n_rows, n_cols = map(int, size.lower().split('x'))
+            fname = os.path.join(tmp_dir, '{}.html'.format(size))
+            buildDashboard(fname, n_rows, n_cols, args.samplers, args.iters, args.sym, args.step,
+                           active_options, predict_options, args.predict)
+            runs.append((dict(n_rows=n_rows, n_cols=n_rows if args.sym else n_cols, n_samplers=args.samplers,
+                              n_iters=args.iters, is_sym=args.sym, predict=args.predict,
+                              active_options=active_options, predict_options=predict_options), fname))
+
+    for params, fname in runs:
+        for result in measurePage('file://' + os.path.abspath(fname), args.n_steps):
+            record = dict(base, **params, html_bytes=os.path.getsize(fname), **result)
+            records.append(record)
+            print('{label} {widget}: callback {callback_ms_median:.1f}ms (p95 {callback_ms_p95:.1f}), '
+                  'frame {frame_ms_median:.1f}ms (p95 {frame_ms_p95:.1f}), heap {heap_bytes_max}'.format(**record))
+
+    if records:
+        appendHistory(records, args.history)
+        print('{} interactions appended to {}'.format(len(records), args.history))
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+Import time budget of the package, each statement timed in a fresh interpreter started outside the repository
+Exits with status 1 when a statement is over its budget or loads a module it should not
+
+Run from the directory containing exploreML, e.g.
+python -m exploreML.benchmarks.import_time --repeat 5
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import tempfile
+import numpy as np
+
+# statement: (budget in seconds, modules that must not be loaded by it)
+default_budgets = {
+    'import exploreML': (0.2, ['bokeh', 'pandas', 'scipy', 'seaborn', 'holoviews']),
+    'from exploreML.data import loadActiveH5': (1.0, ['bokeh', 'seaborn', 'holoviews']),
+    'from exploreML import ActiveExplore': (2.0, ['seaborn', 'holoviews', 'scipy.cluster']),
+    'from exploreML import ExploreML': (2.0, ['seaborn', 'holoviews', 'scipy.cluster']),
+}
+
+measure_py = """
+import sys, time, json
+start = time.perf_counter()
+exec({statement!r})
+seconds = time.perf_counter() - start
+print(json.dumps(dict(seconds=seconds, loaded=[m for m in {forbidden!r} if m in sys.modules])))
+"""
+
+def measureImport(statement, forbidden=(), repeat=3):
+    """
+    Median import time of a statement over repeat fresh interpreters, the forbidden modules it loaded
+    and the last line of the traceback when it failed
+    The interpreters run in a temporary directory, so cwd relative paths fail as they would in a worker
+    """
+    package_parent = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([package_parent, os.environ.get('PYTHONPATH', '')]))
+    code = measure_py.format(statement=statement, forbidden=list(forbidden))
+
+    seconds = []
+    loaded = set()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for i in range(repeat):
+            proc = subprocess.run([sys.executable, '-c', code], cwd=tmp_dir, env=env, capture_output=True, text=True)
+            if proc.returncode != 0:
+                return None, [], proc.stderr.strip().splitlines()[-1]
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            seconds.append(result['seconds'])
+            loaded.update(result['loaded'])
+
+    return float(np.median(seconds)), sorted(loaded), None
+
+def main(args=None):
+    from .run_benchmarks import appendHistory, gitCommit
+
+    parser = argparse.ArgumentParser(description='Check the import time budget of the package')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--scale', type=float, default=1.0, help='multiplier of every budget, for slow machines')
+    parser.add_argument('--label', default='default')
+    parser.add_argument('--history', default=None, help='JSON history to append the results to')
+    args = parser.parse_args(args)
+
+    base = dict(kind='import', label=args.label, commit=gitCommit(), time=time.strftime('%Y-%m-%dT%H:%M:%S'))
+
+    records = []
+    failed = False
+    for statement, (budget, forbidden) in default_budgets.items():
+        seconds, loaded, error = measureImport(statement, forbidden, args.repeat)
+        records.append(dict(base, statement=statement, seconds=seconds, budget_s=budget * args.scale,
+                            loaded=loaded, error=error))
+
+        if error is not None:
+            print('FAIL {}: {}'.format(statement, error))
+        else:
+            over = seconds > budget * args.scale or len(loaded) > 0
+            print('{} {}: {:.2f}s (budget {:.2f}s){}'.format('FAIL' if over else 'ok', statement, seconds,
+                                                             budget * args.scale,
+                                                             ', loaded ' + ', '.join(loaded) if loaded else ''))
+        records[-1]['passed'] = error is None and not over
+        failed = failed or not records[-1]['passed']
+
+    if args.history:
+        appendHistory(records, args.history)
+
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
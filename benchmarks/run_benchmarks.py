@@ -0,0 +1,137 @@
+"""
+Build time and HTML size of ActiveExplore, PredictMap and ExploreML on synthetic experiments
+
+Run from the directory containing exploreML, e.g.
+python -m exploreML.benchmarks.run_benchmarks --sizes 100x100 500x500 --label binary --options '{"encoding": "binary"}'
+"""
+import os
+import gc
+import json
+import time
+import argparse
+import subprocess
+import tempfile
+from bokeh.embed import file_html
+from bokeh.resources import CDN
+from exploreML.models import ActiveExplore
+from exploreML.models.profiling import BuildProfiler
+from exploreML.apps import ExploreML
+from .synthetic import makeSyntheticExperiment
+
+# Written to the working directory, the installed package may be read only
+default_history = 'benchmark_history.json'
+
+def runBenchmark(n_rows, n_cols, n_samplers=3, n_iters=1000, is_sym=False, step=120, active_options=None,
+                 predict_options=None, seed=0):
+    """
+    Time one build of every module on a synthetic experiment
+    active_options, predict_options: extra ActiveExplore/PredictMap kwargs, i.e. the engine under test
+    """
+    active_options = dict(active_options or {})
+    predict_options = dict(predict_options or {})
+    data_dict, sampling_dict, pred_df, predmap_dict = makeSyntheticExperiment(n_rows, n_cols, n_samplers, n_iters,
+                                                                              is_sym, step, seed=seed)
+    names = dict(row_name='gene1', col_name='gene2', is_sym=is_sym, slider_step=step)
+    result = {}
+    # Garbage left by earlier builds is collected here rather than during the timed ones
+    gc.collect()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        url = os.path.join(tmp_dir, 'active_explorer.html')
+
+        active_profiler = BuildProfiler(trace_memory=False)
+        start = time.perf_counter()
+        ActiveExplore(data_dict, sampling_dict, url=url, profiler=active_profiler, **names, **active_options)
+        result['active_explore_s'] = time.perf_counter() - start
+        result['active_explore_html_bytes'] = os.path.getsize(url)
+        result['active_explore_stages_s'] = active_profiler.report()['seconds'].to_dict()
+
+    # The dashboard is saved standalone, so the maps switch with JS callbacks
+    predict_options.setdefault('standalone', True)
+    predict_options.setdefault('mapdictInit', list(sampling_dict)[0])
+
+    explore_profiler = BuildProfiler(trace_memory=False)
+    start = time.perf_counter()
+    explore = ExploreML(profiler=explore_profiler)
+    explore.addActiveExplore(data_dict, sampling_dict, file_output=False, **names, **active_options)
+    explore.addPredictMap(pred_df, predmap_dict, is_sym=is_sym, **predict_options)
+    explore.Layout()
+    result['explore_ml_s'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    html = file_html(explore.layout, CDN, 'benchmark')
+    result['explore_ml_html_s'] = time.perf_counter() - start
+    result['explore_ml_html_bytes'] = len(html.encode())
+
+    report = explore_profiler.report()['seconds']
+    result['predict_map_s'] = report['PredictMap']
+    result['explore_ml_stages_s'] = report.to_dict()
+
+    return result
+
+def warmUp(is_sym=False, step=120, active_options=None, predict_options=None):
+    """
+    Throwaway build on a tiny experiment, so the one time imports done by the first build
+    (seaborn, holoviews, scipy.cluster) are not timed
+    """
+    runBenchmark(8, 8, n_samplers=1, n_iters=step, is_sym=is_sym, step=step, active_options=active_options,
+                 predict_options=predict_options)
+
+def gitCommit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(__file__),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def appendHistory(records, history=default_history):
+    """
+    Append benchmark records to the JSON history file
+    """
+    runs = []
+    if os.path.exists(history):
+        with open(history, 'r') as f:
+            runs = json.load(f)
+
+    runs += records
+    with open(history, 'w') as f:
+        json.dump(runs, f, indent=1)
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Benchmark dashboard builds on synthetic experiments')
+    parser.add_argument('--sizes', nargs='+', default=['100x100'], help='matrix sizes as ROWSxCOLS')
+    parser.add_argument('--samplers', type=int, default=3)
+    parser.add_argument('--iters', type=int, default=1000)
+    parser.add_argument('--step', type=int, default=120)
+    parser.add_argument('--sym', action='store_true', help='symmetric experiments, the matrix is ROWSxROWS')
+    parser.add_argument('--options', default='{}', help='JSON of extra ActiveExplore kwargs')
+    parser.add_argument('--predict-options', default='{}', help='JSON of extra PredictMap kwargs')
+    parser.add_argument('--label', default='default', help='name of the engine configuration')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--history', default=default_history, help='JSON history to append the runs to')
+    args = parser.parse_args(args)
+
+    active_options = json.loads(args.options)
+    predict_options = json.loads(args.predict_options)
+    commit = gitCommit()
+    warmUp(args.sym, args.step, active_options, predict_options)
+
+    records = []
+    for size in args.sizes:
+        n_rows, n_cols = map(int, size.lower().split('x'))
+        for i in range(args.repeat):
+            result = runBenchmark(n_rows, n_cols, args.samplers, args.iters, args.sym, args.step,
+                                  active_options, predict_options, seed=i)
+            record = dict(label=args.label, commit=commit, time=time.strftime('%Y-%m-%dT%H:%M:%S'),
+                          n_rows=n_rows, n_cols=n_rows if args.sym else n_cols, n_samplers=args.samplers,
+                          n_iters=args.iters, step=args.step, is_sym=args.sym, active_options=active_options,
+                          predict_options=predict_options, **result)
+            records.append(record)
+            print('{label} {n_rows}x{n_cols}: ActiveExplore {active_explore_s:.2f}s {active_explore_html_bytes}B, '
+                  'PredictMap {predict_map_s:.2f}s, ExploreML {explore_ml_s:.2f}s {explore_ml_html_bytes}B'.format(**record))
+
+    appendHistory(records, args.history)
+    print('{} runs appended to {}'.format(len(records), args.history))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+predmap_labels = ['prediction', 'uncertainty', 'density', 'similarity']
+
+def makeSyntheticExperiment(n_rows=100, n_cols=100, n_samplers=3, n_iters=1000, is_sym=False, step=120,
+                            batch_size=10, metrics=['rmse','r2','pearson'], row_name='gene1', col_name='gene2',
+                            seed=0):
+    """
+    Synthetic active learning experiment in the layout of loadActiveH5 and the PredictMap inputs
+    Returns data_dict, sampling_dict, pred_df and predmap_dict
+
+    n_rows, n_cols: matrix shape, symmetric experiments use n_rows for both
+    n_iters: active learning iterations of every sampler
+    step: slider step of the predmap_dict iteration columns
+    """
+    rng = np.random.default_rng(seed)
+
+    if is_sym:
+        n_cols = n_rows
+    rows = ['r{}'.format(i) for i in range(n_rows)]
+    cols = rows if is_sym else ['c{}'.format(i) for i in range(n_cols)]
+
+    # Low rank matrix with noise, so the clusterings have some structure
+    rank = min(5, n_rows, n_cols)
+    values = rng.normal(size=(n_rows, rank)) @ rng.normal(size=(rank, n_cols)) / np.sqrt(rank)
+    values += 0.1 * rng.normal(size=(n_rows, n_cols))
+    if is_sym:
+        values = (values + values.T) / 2
+
+    M = pd.DataFrame(values, index=rows, columns=cols)
+    S_train = pd.DataFrame(rng.random((n_rows, n_cols)) < 0.1, index=rows, columns=cols)
+    data_dict = {'M':M, 'S_train':S_train}
+
+    sampling_dict = {}
+    for i in range(n_samplers):
+        row_idx = rng.integers(0, n_rows, n_iters)
+        col_idx = rng.integers(0, n_cols, n_iters)
+        if is_sym:
+            row_idx, col_idx = np.minimum(row_idx, col_idx), np.maximum(row_idx, col_idx)
+
+        progress = np.linspace(0, 1, n_iters)
+        sampler = pd.DataFrame({'active_iter':np.arange(n_iters), 'batch':np.arange(n_iters) // batch_size,
+                                'row_idx':row_idx, 'col_idx':col_idx})
+        for metric in metrics:
+            sampler[metric] = progress * rng.uniform(0.5, 1) + 0.05 * rng.normal(size=n_iters)
+        sampling_dict['sampler{}'.format(i)] = sampler
+
+    # Upper triangle only for symmetric experiments, PredictMap mirrors it
+    if is_sym:
+        row_coord, col_coord = np.triu_indices(n_rows)
+    else:
+        row_coord, col_coord = np.divmod(np.arange(n_rows * n_cols), n_cols)
+
+    n_entries = len(row_coord)
+    pred_df = pd.DataFrame({row_name:np.asarray(rows)[row_coord], col_name:np.asarray(cols)[col_coord],
+                            'row_coord':row_coord, 'col_coord':col_coord,
+                            'x':rng.normal(size=n_entries), 'y':rng.normal(size=n_entries)})
+
+    iterations = [str(i) for i in range(0, n_iters + 1, step)]
+    predmap_dict = {sampler:{label:pd.DataFrame(rng.random((n_entries, len(iterations)), dtype=np.float32),
+                                                columns=iterations)\
+                             for label in predmap_labels}\
+                    for sampler in sampling_dict}
+
+    return data_dict, sampling_dict, pred_df, predmap_dict
@@ -1 +1,16 @@
-from .utils import *
+import importlib
+
+# pandas and scipy are only imported with the loaders
+__all__ = ['saveActiveH5', 'loadActiveH5', 'saveActiveParquet', 'loadActiveParquet', 'ActiveH5Store',
+           'ActiveH5Tail', 'ActiveParquetTail']
+
+def __getattr__(name):
+    if name not in __all__:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+
+    value = getattr(importlib.import_module('.utils', __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
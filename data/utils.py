@@ -1,11 +1,33 @@
 import os
+import json
+import numpy as np
 import pandas as pd
+from scipy import sparse
+from ..models.stats import ColumnStats, mergeStats
 
-def saveActiveH5(data_dict, sampling_dict, fname='exploreML/exploreML/data/active_data.h5'):
+_columnar_ext = {'parquet':'.parquet', 'arrow':'.arrow'}
+_stats_key = b'exploreML.column_stats'
+
+def saveActiveH5(data_dict, sampling_dict, fname='exploreML/exploreML/data/active_data.h5', format='fixed',
+                 data_columns=['active_iter','row_idx','col_idx']):
+    """
+    format: 'fixed' or 'table' for the sampler frames, table format can be read with where filters
+    data_columns: sampler columns indexed for where filters in table format
+    scipy.sparse data (e.g. M and S_train with 'row_labels'/'col_labels' arrays) is stored as its COO entries
+    The column statistics of every sampler are stored with it, so ActiveExplore does not rescan the rows
+    """
     s = pd.HDFStore(fname) # ideally, check if exists first
 
     for key, value in data_dict.items():
         name = os.path.join('data',key)
+        if sparse.issparse(value):
+            value = value.tocoo()
+            s[name] = pd.DataFrame({'row':value.row, 'col':value.col, 'value':value.data})
+            s.get_storer(name).attrs.sparse_shape = value.shape
+            continue
+        elif isinstance(value, np.ndarray) and value.ndim == 1:
+            value = pd.Series(value)
+
         try:
             s[name] = value
         except TypeError:
@@ -13,23 +35,337 @@ def saveActiveH5(data_dict, sampling_dict, fname='exploreML/exploreML/data/activ
 
     for key, value in sampling_dict.items():
         name = os.path.join('samples',key)
-        try:
-            s[name] = value
-        except TypeError:
-            s[name] = pd.DataFrame(value)
+        if not isinstance(value, (pd.DataFrame, pd.Series)):
+            value = pd.DataFrame(value)
+
+        if format == 'table':
+            s.put(name, value, format='table',
+                  data_columns=[col for col in data_columns if col in value.columns])
+        else:
+            s.put(name, value, format=format)
+        s.get_storer(name).attrs.column_stats = ColumnStats.fromFrame(value).state()
 
     print('Pandas h5py file saved to {}'.format(fname))
     s.close()
 
-def loadActiveH5(fname='exploreML/exploreML/data/active_data.h5'):
+def loadActiveH5(fname='exploreML/exploreML/data/active_data.h5', samplers=None, data_keys=None,
+                 iter_range=None, lazy=False):
+    """
+    samplers: sampler names to read (None for all)
+    data_keys: data keys to read, e.g. ['M','S_train'] (None for all)
+    iter_range: (start, stop) range of active iterations to read from the samplers
+    lazy: return an ActiveH5Store handle instead of reading the frames
+    """
+    if lazy:
+        return ActiveH5Store(fname)
+
+    with ActiveH5Store(fname) as s:
+        data_dict, sampling_dict = s.load(samplers=samplers, data_keys=data_keys, iter_range=iter_range)
+
+    return data_dict, sampling_dict
+
+def saveActiveParquet(data_dict, sampling_dict, dirname='exploreML/exploreML/data/active_data', format='parquet',
+                      compression=None):
+    """
+    Columnar alternative to saveActiveH5, one file per key under dirname/data and dirname/samples
+    format: 'parquet' or 'arrow' (Arrow IPC, memory mapped without decoding on load when uncompressed)
+    compression: compression codec of the files, None for zstd Parquet and uncompressed Arrow
+    The column statistics of every sampler are stored in its schema metadata
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if compression is None and format == 'parquet':
+        compression = 'zstd'
+
+    for group, frames in [('data', data_dict), ('samples', sampling_dict)]:
+        os.makedirs(os.path.join(dirname, group), exist_ok=True)
+
+        for key, value in frames.items():
+            if not isinstance(value, pd.DataFrame):
+                value = pd.DataFrame(value)
+            table = pa.Table.from_pandas(value)
+            if group == 'samples':
+                state = json.dumps(ColumnStats.fromFrame(value).state()).encode()
+                table = table.replace_schema_metadata({**(table.schema.metadata or {}), _stats_key:state})
+            name = os.path.join(dirname, group, key + _columnar_ext[format])
+
+            if format == 'parquet':
+                pq.write_table(table, name, compression=compression)
+            else:
+                with pa.ipc.new_file(name, table.schema,
+                                     options=pa.ipc.IpcWriteOptions(compression=compression)) as writer:
+                    writer.write_table(table)
+
+    print('{} files saved to {}'.format(format.capitalize(), dirname))
+
+def loadActiveParquet(dirname='exploreML/exploreML/data/active_data', samplers=None, data_keys=None,
+                      memory_map=True, as_table=False):
+    """
+    Load the (data_dict, sampling_dict) saved with saveActiveParquet
+    A key is the file dirname/<group>/<key>.parquet (or .arrow) followed by the files of a dirname/<group>/<key>
+    directory in name order, the batches appended by a running experiment (see ActiveParquetTail)
+    samplers: sampler names to read (None for all)
+    data_keys: data keys to read, e.g. ['M','S_train'] (None for all)
+    memory_map: memory map the files instead of reading them into memory
+    as_table: return pyarrow Tables, uncompressed Arrow files are then never copied
+    """
+    import pyarrow as pa
+
     data_dicts = {'samples':{},'data':{}}
+    wanted = {'samples':samplers, 'data':data_keys}
 
-    s = pd.HDFStore(fname)
-    h5data = [x.split('/')[1:] for x in s.keys()]
+    for group in data_dicts:
+        path = os.path.join(dirname, group)
+        keys = sorted({os.path.splitext(fname)[0] for fname in os.listdir(path)\
+                       if os.path.splitext(fname)[1] in _columnar_ext.values() or os.path.isdir(os.path.join(path, fname))})
 
-    for group,key in h5data:
-        name = os.path.join(group, key)
-        data_dicts[group][key] = s.get(name)
+        for key in keys:
+            if wanted[group] is not None and key not in wanted[group]:
+                continue
+            fnames = _columnarFiles(path, key)
+            if not fnames:
+                continue
+
+            tables = [_readColumnar(os.path.join(path, fname), memory_map) for fname in fnames]
+            states = [(table.schema.metadata or {}).get(_stats_key) for table in tables]
+            table = tables[0] if len(tables) == 1 else pa.concat_tables(tables)
+            if as_table:
+                data_dicts[group][key] = table
+                continue
+
+            # Columns without nulls are converted without a copy, the table releases its buffers as it goes
+            df = table.to_pandas(self_destruct=True, split_blocks=True)
+            # Batch files appended without statistics leave the sampler to be rescanned
+            if all(state is not None for state in states):
+                state = mergeStats([ColumnStats.fromState(json.loads(state)) for state in states]).state()
+                df = _attachStats(df, state)
+            data_dicts[group][key] = df
 
-    s.close()
     return data_dicts['data'], data_dicts['samples']
+
+def _columnarFiles(path, key):
+    """
+    Files of a key relative to path, the key file followed by the files of the key directory in name order
+    """
+    fnames = [key + ext for ext in _columnar_ext.values() if os.path.isfile(os.path.join(path, key + ext))]
+    if os.path.isdir(os.path.join(path, key)):
+        fnames += sorted(os.path.join(key, fname) for fname in os.listdir(os.path.join(path, key))\
+                         if os.path.splitext(fname)[1] in _columnar_ext.values())
+
+    return fnames
+
+def _attachStats(df, state):
+    """
+    Stored column statistics as df.attrs['column_stats'], only when they count every row of the frame
+    """
+    if state is not None and state['rows'] == df.shape[0]:
+        df.attrs['column_stats'] = ColumnStats.fromState(state)
+
+    return df
+
+def _columnarRows(name):
+    """
+    Number of rows of a Parquet or Arrow file, from its metadata
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if name.endswith(_columnar_ext['parquet']):
+        return pq.ParquetFile(name).metadata.num_rows
+
+    reader = pa.ipc.open_file(pa.memory_map(name))
+    return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+
+def _readColumnar(name, memory_map=True):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if name.endswith(_columnar_ext['parquet']):
+        return pq.read_table(name, memory_map=memory_map)
+
+    source = pa.memory_map(name) if memory_map else pa.OSFile(name)
+    return pa.ipc.open_file(source).read_all()
+
+class ActiveH5Store:
+
+    """
+    Lazy handle on a store saved with saveActiveH5, frames are only read when requested
+
+    Args:
+    fname: name of the h5 file
+    active_x: column name for active iteration
+    """
+
+    def __init__(self, fname='exploreML/exploreML/data/active_data.h5', active_x='active_iter'):
+
+        self.fname = fname
+        self.active_x = active_x
+        self._store = pd.HDFStore(fname, mode='r')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._store.close()
+
+    def keys(self, group):
+        """
+        Keys stored under a group ('data' or 'samples')
+        """
+        h5data = [x.split('/')[1:] for x in self._store.keys()]
+        return [key for key_group,key in h5data if key_group == group]
+
+    @property
+    def samplers(self):
+        return self.keys('samples')
+
+    def data(self, key):
+        """
+        Data frame of a key, or the CSR matrix of sparse data
+        """
+        name = os.path.join('data', key)
+        storer = self._store.get_storer(name)
+
+        if 'sparse_shape' in storer.attrs:
+            entries = self._store.get(name)
+            return sparse.coo_matrix((entries['value'].values, (entries['row'].values, entries['col'].values)),
+                                     shape=tuple(storer.attrs.sparse_shape)).tocsr()
+
+        return self._store.get(name)
+
+    def sampler(self, key, iter_range=None, columns=None):
+        """
+        Read a sampler frame, only the active iterations in [start, stop) when iter_range is given
+        Table format stores are filtered on disk, fixed format stores are filtered after reading
+        Whole frames carry their stored column statistics in df.attrs['column_stats']
+        """
+        name = os.path.join('samples', key)
+        storer = self._store.get_storer(name)
+
+        if iter_range is None and columns is None:
+            return _attachStats(self._store.get(name), getattr(storer.attrs, 'column_stats', None))
+
+        if storer.is_table:
+            where = None
+            if iter_range is not None:
+                where = '({0} >= {1}) & ({0} < {2})'.format(self.active_x, *iter_range)
+            return self._store.select(name, where=where, columns=columns)
+
+        df = self._store.get(name)
+        if iter_range is not None:
+            df = df[(df[self.active_x] >= iter_range[0]) & (df[self.active_x] < iter_range[1])]
+        if columns is not None:
+            df = df.loc[:, columns]
+
+        return df
+
+    def load(self, samplers=None, data_keys=None, iter_range=None):
+        """
+        (data_dict, sampling_dict) of the requested data keys and samplers
+        """
+        data_keys = self.keys('data') if data_keys is None else data_keys
+        samplers = self.samplers if samplers is None else samplers
+
+        data_dict = {key:self.data(key) for key in data_keys}
+        sampling_dict = {key:self.sampler(key, iter_range) for key in samplers}
+
+        return data_dict, sampling_dict
+
+class ActiveH5Tail:
+
+    """
+    Rows appended to a table format sampler since the last read, for following a running experiment
+    The store is opened per read, so the learner can keep appending between polls
+
+    Args:
+    fname: name of the h5 file
+    key: sampler name
+    n_seen: rows already read
+    """
+
+    def __init__(self, fname, key, n_seen=0):
+
+        self.fname = fname
+        self.key = key
+        self.n_seen = n_seen
+
+    def read(self):
+        """
+        Frame of the new rows, None while the store is unavailable
+        """
+        try:
+            with pd.HDFStore(self.fname, mode='r') as store:
+                df = store.select(os.path.join('samples', self.key), start=self.n_seen)
+        except (OSError, KeyError):
+            return None
+
+        self.n_seen += df.shape[0]
+
+        return df
+
+    def skip(self, n_rows):
+        """
+        Start after the first n_rows of the sampler, e.g. the rows a dashboard was built from
+        """
+        self.n_seen = max(self.n_seen, n_rows)
+
+class ActiveParquetTail:
+
+    """
+    Rows of the sampler files added since the last read, in the layout read by loadActiveParquet:
+    dirname/samples/<key>.parquet followed by one file per learner batch in dirname/samples/<key>/
+    Batch files are read in name order, so the learner should name them by batch, e.g. 00012.parquet,
+    and write them under another name before renaming so partial files are never read
+
+    Args:
+    dirname: directory given to saveActiveParquet
+    key: sampler name
+    seen: file names already read, relative to dirname/samples
+    """
+
+    def __init__(self, dirname, key, seen=()):
+
+        self.path = os.path.join(dirname, 'samples')
+        self.key = key
+        self.seen = set(seen)
+        self.offsets = {} # Rows already read at the start of an unseen file
+
+    def read(self):
+        """
+        Frame of the rows in unseen files, None when there are none
+        """
+        if not os.path.isdir(self.path):
+            return None
+
+        fnames = [fname for fname in _columnarFiles(self.path, self.key) if fname not in self.seen]
+        if not fnames:
+            return None
+
+        frames = [_readColumnar(os.path.join(self.path, fname)).to_pandas().iloc[self.offsets.pop(fname, 0):]\
+                  for fname in fnames]
+        self.seen.update(fnames)
+
+        return pd.concat(frames, ignore_index=True)
+
+    def skip(self, n_rows):
+        """
+        Start after the first n_rows of the sampler, e.g. the rows a dashboard was built from
+        Only the file row counts are read
+        """
+        if not os.path.isdir(self.path):
+            return
+
+        n_files = 0
+        for fname in _columnarFiles(self.path, self.key):
+            if n_files >= n_rows:
+                break
+            n_file = _columnarRows(os.path.join(self.path, fname))
+            if n_files + n_file <= n_rows:
+                self.seen.add(fname)
+            elif fname not in self.seen:
+                self.offsets[fname] = max(self.offsets.get(fname, 0), n_rows - n_files)
+            n_files += n_file
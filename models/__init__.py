@@ -1,2 +1,16 @@
-from .active_explore import ActiveExplore
-from .predict_map import PredictMap
+import importlib
+
+_lazy = {'ActiveExplore':'.active_explore', 'PredictMap':'.predict_map'}
+
+__all__ = list(_lazy)
+
+def __getattr__(name):
+    if name not in _lazy:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+
+    value = getattr(importlib.import_module(_lazy[name], __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
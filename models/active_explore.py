@@ -1,28 +1,28 @@
 import numpy as np
 import pandas as pd
-import seaborn as sns
 import math
-from bokeh.io import show, save
+from bokeh.io import show, save, curdoc
 from bokeh.plotting import Figure, output_file, show, output_notebook
 from bokeh.layouts import column, row
 from bokeh.models import ColorBar, LinearColorMapper, BasicTicker, CustomJS, ColumnDataSource,\
  Toggle, Slider, RadioButtonGroup, Select, Legend, ColorPicker, Panel, Tabs, RangeSlider,HoverTool
 from bokeh.models.widgets import Div
 from bokeh.palettes import all_palettes
-from scipy.cluster.hierarchy import linkage, dendrogram
 import itertools
+from scipy import sparse
+from .utils import loadJS, encodeSourceData, compactArray, makeFactorTransforms, factorField, factorTooltip, factorFormatters,\
+ makeImageData, makeUpperMask, makeClustData, rangeFormatters
+from .clustering import ClustCache, parallelLeaves, linkageLeaves, cacheMethod, matrixValues
+from .profiling import BuildProfiler
+from .stats import ColumnStats, mergeStats
 
-with open('exploreML/models/active_explore_js/slider_callback.js','r') as f:
-    slider_callback_js = f.read()
-
-with open('exploreML/models/active_explore_js/line_callback.js','r') as f:
-    line_callback_js = f.read()
 
 class ActiveExplore:
 
     """
     Args:
     data_dict: dictionary of matrix reconstruction dataframes, key value pairs
+               M and S_train may be scipy.sparse matrices, labelled by the 'row_labels' and 'col_labels' arrays
     sampling_dict: dictionary of sampling method and df, key value pairs
     is_sym: sample the points symmetrically (True or False)
     num_line_plots: number of line plots
@@ -37,6 +37,19 @@ class ActiveExplore:
     row_name: row label on heatmap
     col_name: col label on heatmap
     val_name: label for matrix entries
+    encoding: source encoding, 'list' for JSON lists or 'binary' for typed arrays with factor coded labels
+    heatmap_renderer: 'rect' for one glyph per matrix entry or 'image' for a single image of the reordered matrix
+    clust_cache: ClustCache or cache directory (e.g. next to the H5 data) to reuse cluster orderings across builds
+    clust_workers: number of processes to run the (method, axis) linkages concurrently (None to run serially)
+    clust_backend: ordering backend, 'linkage', 'sampled' (linkage on a subset) or 'spectral' (rank one seriation)
+    clust_sample_size: number of rows/cols clustered by the 'sampled' backend
+    clust_sampling: subset of the 'sampled' backend, 'random' rows or 'kmeans' centroids
+    slider_mode: 'js' to embed every sampler's full history for the browser side slider callbacks,
+                 'server' to stream only the rows of each slider move from Python (Bokeh server only)
+    slider_step: active iterations per sampler slider step, the step of the PredictMap map snapshots
+    source_registry: SourceRegistry sharing the unmutated sources and cluster orderings with other panels of the document
+    profiler: BuildProfiler recording the wall time and peak memory of the build stages
+    live_rollover: rows kept in the active sources while following a live experiment (None to keep all), see startLive
     """
 
     def __init__(self, data_dict, sampling_dict, is_sym=False, num_line_plots=2,
@@ -46,7 +59,10 @@ class ActiveExplore:
                  heatmap_colors = 'default', n_colors=10, inds_colors=[1,2,4,5,6,7,8],
                  color_palette='Category10',plot_size=700, line_width=500, line_height=300,
                  name='active explorer', url='active_explorer.html', plot_location='below',
-                 file_output=True):
+                 file_output=True, encoding='list', heatmap_renderer='rect',
+                 clust_cache=None, clust_workers=None, clust_backend='linkage', clust_sample_size=2000,
+                 clust_sampling='random', slider_mode='js', slider_step=120,
+                 source_registry=None, profiler=None, live_rollover=None):
 
         self.name = name
         self.numLinePlots = num_line_plots
@@ -54,19 +70,50 @@ class ActiveExplore:
         self.row_name = row_name
         self.col_name = col_name
         self.plot_size = plot_size
+        self.encoding = encoding
+        self.slider_mode = slider_mode
+        self.live_buffers = None
+        self.source_registry = source_registry
+        profiler = profiler if profiler is not None else BuildProfiler(enabled=False)
+        self.profiler = profiler
 
         # Load data
         M = data_dict['M']
-        S_train = data_dict['S_train'].values
+        S_train = data_dict['S_train']
         sampling_names, sampling_dfs = zip(*sampling_dict.items())
 
+        is_sparse = sparse.issparse(M)
+        if is_sparse:
+            # Sources are built from the stored entries, only the linkages and images densify M
+            M = M.tocsr()
+            S_train = sparse.csr_matrix(S_train.values if isinstance(S_train, pd.DataFrame) else S_train)
+            df_index = pd.Index(data_dict.get('row_labels', np.arange(M.shape[0]).astype(str)))
+            df_cols = pd.Index(data_dict.get('col_labels', np.arange(M.shape[1]).astype(str)))
+            M_frame = pd.DataFrame.sparse.from_spmatrix(M, index=df_index, columns=df_cols)
+        else:
+            S_train = S_train.toarray() if sparse.issparse(S_train) else S_train.values
+            df_index = M.index
+            df_cols = M.columns
+            M_frame = M
+        self.is_sparse = is_sparse
+
         # Variables and presets
         meta_vars = dict(rowName=row_name, colName=col_name, valName=val_name,
                          rowCoord=row_coord, colCoord=col_coord) # Metadata for variables
-        df_index = M.index
-        df_cols = M.columns
 
-        # Colors and palettes
+        # Factor tables for the row/col labels, binary sources carry their codes instead of the labels
+        factor_tables = {row_name:df_index.tolist(), col_name:df_cols.tolist()} if encoding == 'binary' else {}
+        self.meta_vars = meta_vars
+        self.factor_tables = factor_tables
+        self.df_index = df_index
+        self.df_cols = df_cols
+        self.sampler_cols = dict(row_idx=row_coord, col_idx=col_coord, active_col=active_x, batch_col=batch_col)
+        factor_transforms = self._shared('factor_transforms', (df_index, df_cols, row_name, col_name, encoding),
+                                         lambda: makeFactorTransforms(factor_tables))
+        self.factor_transforms = factor_transforms
+
+        # Colors and palettes, seaborn is only imported once a dashboard is built
+        import seaborn as sns
         if isinstance(heatmap_colors, sns.palettes._ColorPalette):
             heatmap_colors = heatmap_colors.as_hex()
         else:
@@ -82,61 +129,106 @@ class ActiveExplore:
 
         active_dim = sampling_dfs[0].shape[0]
         self.active_dim = active_dim
-        if self.is_sym:
-            sampling_methods = [self._makeSymAL(sampler, row_coord, col_coord, active_x, batch_col)\
-                                for sampler in sampling_dfs]
-            symMult = 2
-        else:
-            sampling_methods = sampling_dfs
-            symMult = 1
+        with profiler.stage('sym_expansion'):
+            if self.is_sym:
+                sampling_methods = [self._makeSymAL(sampler, row_coord, col_coord, active_x, batch_col)\
+                                    for sampler in sampling_dfs]
+                symMult = 2
+            else:
+                sampling_methods = sampling_dfs
+                symMult = 1
+        self.symMult = symMult
 
         self.sampling_methods = sampling_methods
 
         # Precompute the indices for the different clustering methods
-        clust_dict = {method:self._makeClustIndex(M, method) for method in clust_methods}
+        if isinstance(clust_cache, str):
+            clust_cache = ClustCache(clust_cache)
+        self.clust_timings = {} # Wall time of each (method, axis) linkage
+        self.clust_options = dict(clust_backend=clust_backend, sample_size=clust_sample_size, sampling=clust_sampling)
+        with profiler.stage('clustering'):
+            clust_dict = self._shared('clust_dict', (M, df_index, df_cols, clust_methods, self.clust_options),
+                                      lambda: self._makeClustDict(M_frame, clust_methods, clust_cache, clust_workers))
         self.clust_dict = clust_dict
         self.clust_methods = clust_methods
 
         # Active learning data
-        sampling_data = {sample:self._addIndexCols(df, df_index, df_cols, meta_vars)\
-                        for df,sample in zip(sampling_methods,sampling_names)}
+        with profiler.stage('index_cols'):
+            sampling_data = {sample:self._addIndexCols(df, df_index, df_cols, meta_vars)\
+                            for df,sample in zip(sampling_methods,sampling_names)}
         self.sampling_data = sampling_data
 
-        samplerCol_meta = pd.concat([sampling_data[sampler].describe().loc[['min','max'],:]\
-         for sampler in sampling_names]).describe().to_dict()
+        # Statistics stored with the data when loaded from saveActiveH5/saveActiveParquet files,
+        # otherwise one streaming pass per sampler for the axis ranges and the quantitative columns
+        with profiler.stage('sampler_stats'):
+            sampler_stats = {sampler:self._samplerStats(df, sampling_data[sampler])\
+                             for sampler,df in zip(sampling_names, sampling_dfs)}
+        self.sampler_stats = sampler_stats
 
+        samplerCol_meta = mergeStats(sampler_stats.values()).meta()
         self.samplerCol_meta = samplerCol_meta
 
-        # Column source data of mask for each clustering method
-        upper_dict = {method:self._makeGImatrix(self._makeMaskUpper(M.iloc[clust_dict[method][0],clust_dict[method][1]]),meta_vars)\
-                   .dropna(axis=0).to_dict(orient='list') for method in clust_methods}
-        self.upper_dict = upper_dict
-
         # Collecting the quantitative columns from the sampling data
-        quant_options = sampling_methods[0].describe().T.query('std > 0').index.to_list()
+        quant_options = sampler_stats[sampling_names[0]].varying()
 
         line_y_keys = [col for col in quant_options[:self.numLinePlots]]
 
         # Make sources
 
-        # Active learning column source data
-        sampling_sources = {sampler:ColumnDataSource(data.to_dict(orient='list'))\
-                        for sampler,data in sampling_data.items()}
-
-        upper_source = ColumnDataSource(data=upper_dict[init_clust])
-        self.upper_source = upper_source
-
-        # Initialize sources
-        # GI column source data
-        heatmap_source = ColumnDataSource(data=self._makeGImatrix(M, meta_vars).to_dict(orient='list'))
-        # Active sources
-        active_sources = {sampler:ColumnDataSource({key:[]\
-                          for key in sampling_sources[sampler].data.keys()})\
-                          for sampler in sampling_names}
-        # Training data source
-        train_source = ColumnDataSource(self._makeGImatrix(M.where(S_train.astype(bool)), meta_vars)\
-        .dropna(axis=0)\
-        .to_dict(orient='list'))
+        with profiler.stage('sources'):
+            # Active learning column source data, only embedded in the page when sliced by the browser
+            def sampling_source(data):
+                source_data = encodeSourceData(data, encoding, factor_tables)
+                return ColumnDataSource(source_data) if slider_mode == 'js' else source_data
+
+            shared_sampling = {sampler:self._shared('sampling_'+slider_mode, (data, encoding, df_index, df_cols),
+                                                    lambda data=data: sampling_source(data))\
+                               for sampler,data in sampling_data.items()}
+            if slider_mode == 'js':
+                sampling_sources = shared_sampling
+                sampling_source_data = {sampler:source.data for sampler,source in sampling_sources.items()}
+            else:
+                sampling_source_data = shared_sampling
+            self.sampling_source_data = sampling_source_data
+
+            # Upper triangle mask in display positions, identical for every cluster ordering
+            upper_source = self._shared('upper', (M.shape,), lambda: ColumnDataSource(data=makeUpperMask(*M.shape)))
+            self.upper_source = upper_source
+
+            # Cluster orderings read by the radio callbacks, keyed by the registry held clust_dict
+            clust_sources = self._shared('clust_sources', (id(clust_dict),),
+                                         lambda: tuple(ColumnDataSource(data) for data in makeClustData(clust_dict)))
+            self.clust_sources = clust_sources
+
+            # Initialize sources
+            # GI and training column source data, selected from one long format pass over M
+            def long_sources():
+                if is_sparse:
+                    long_data = self._makeSparseLongData(M, S_train, df_index, df_cols, meta_vars, encoding,
+                                                         heatmap_renderer != 'image')
+                else:
+                    subsets = {'train':S_train.astype(bool) & ~np.isnan(M.values)}
+                    if heatmap_renderer != 'image':
+                        subsets['heatmap'] = None
+                    long_data = self._makeLongData(M, meta_vars, encoding, subsets)
+                return {name:ColumnDataSource(data) for name,data in long_data.items()}
+
+            long_sources = self._shared('long_'+heatmap_renderer, (M, S_train, df_index, df_cols, encoding, meta_vars), long_sources)
+
+            # One image of the reordered matrix or the melted entries
+            # The image is reordered in place by the cluster radio, so only the melted entries are shared
+            if heatmap_renderer == 'image':
+                heatmap_source = ColumnDataSource(data=makeImageData(M.toarray() if is_sparse else M.values,
+                                                                     clust_dict[init_clust][0], clust_dict[init_clust][1]))
+            else:
+                heatmap_source = long_sources['heatmap']
+            # Active sources
+            active_sources = {sampler:ColumnDataSource({key:[] if slider_mode == 'js' else values[:0]\
+                              for key,values in sampling_source_data[sampler].items()})\
+                              for sampler in sampling_names}
+            self.active_sources = active_sources
+            # Training data source
+            train_source = long_sources['train']
 
         TOOLS = "save,box_zoom,reset"
         p = Figure(title="Active Learning Explorer", frame_width=plot_size, frame_height=plot_size,
@@ -159,8 +251,9 @@ class ActiveExplore:
             p.axis.major_label_standoff = 0
             p.xaxis.major_label_orientation = np.pi/3
 
-        heat_max = M.values.max()
-        heat_min = M.values.min()
+        heat_values = M.data if is_sparse else M.values
+        heat_max = heat_values.max()
+        heat_min = heat_values.min()
         heat_upper_bound = min(abs(heat_min),abs(heat_max))
         heat_lower_bound = -heat_upper_bound if heat_min < 0 else heat_min
 
@@ -204,48 +297,72 @@ class ActiveExplore:
         """))
 
         # GI Heatmap
-        heatFig = p.rect(x=col_name, y=row_name, height=1, width=1,
-               source=heatmap_source,
-               color={'field': val_name, 'transform': heat_mapper})
+        x_field = factorField(col_name, factor_transforms)
+        y_field = factorField(row_name, factor_transforms)
+
+        if heatmap_renderer == 'image':
+            # Numeric image coordinates pass straight through the factor ranges
+            heatFig = p.image(image='image', x=0, y=0, dw=M.shape[1], dh=M.shape[0],
+                              source=heatmap_source, color_mapper=heat_mapper)
+        else:
+            heatFig = p.rect(x=x_field, y=y_field, height=1, width=1,
+                   source=heatmap_source,
+                   color={'field': val_name, 'transform': heat_mapper})
         self.heatmap_source = heatmap_source
         # Active
-        heatFigs = {sampler:p.circle(x=col_name, y=row_name, source=active_sources[sampler], radius=0.5,\
+        heatFigs = {sampler:p.circle(x=x_field, y=y_field, source=active_sources[sampler], radius=0.5,\
                     color=sampler_color[sampler], line_color=sampler_color[sampler])\
                     for sampler in sampling_names}
 
         # Training mask
-        trainFig = p.rect(x=col_name, y=row_name, source=train_source,
+        trainFig = p.rect(x=x_field, y=y_field, source=train_source,
                           height=2, width=2, color="white")
         trainFig.visible = False
 
         # Upper mask
-        upperFig = p.rect(x=col_name, y=row_name, source=upper_source, height=1, width=1, color="white")
+        upperFig = p.patch(x='x', y='y', source=upper_source, color="white", line_color=None)
         upperFig.visible = False
 
         p.add_tools(
             HoverTool(
-                      tooltips=[('index', '@{} | @{}'.format(row_name,col_name)),(val_name, '@{}'.format(val_name))],
+                      tooltips=[('index', '{} | {}'.format(factorTooltip(row_name, factor_transforms),
+                                                           factorTooltip(col_name, factor_transforms))),
+                                (val_name, '@{}'.format(val_name))],
+                      formatters=factorFormatters(factor_transforms),
                       mode='mouse',
-                      renderers=[trainFig, heatFig]
+                      renderers=[trainFig, heatFig] if heatmap_renderer == 'rect' else [trainFig]
             )
         )
 
+        if heatmap_renderer == 'image':
+            # Labels under the cursor are looked up from the current range factors
+            p.add_tools(
+                HoverTool(
+                          tooltips=[('index', '$y{custom} | $x{custom}'),(val_name, '@image')],
+                          formatters=rangeFormatters(p),
+                          mode='mouse',
+                          renderers=[heatFig]
+                )
+            )
+
         # List of Lists: [Fig, and dictionary of lineplots for each sampler, tabs] ->
         # for each predefined line_y_keys
         line_plots = [self._createLinePlot(y_key, samplerCol_meta, active_x, sampling_names,
                       active_sources, sampler_color, line_width, line_height) for y_key in line_y_keys]
         self.line_plots = line_plots
 
-        with open('exploreML/models/active_explore_js/radio_call.js','r') as f:
-            radio_call_js = f.read()
+        radio_call_js = loadJS('radio_call.js')
 
-        # TODO: Make step a variable
-        sample_sliders = {sampler:Slider(start=0, end=active_dim, value=0, step=120,\
-                          title=title,max_width=300)\
+        sample_sliders = {sampler:Slider(start=0, end=active_dim, value=0, step=slider_step,\
+                          title=title,max_width=300,name='slider_{}'.format(sampler))\
                           for sampler,title in zip(sampling_names,sampling_titles)}
 
-        slider_js = {sampler:sample_sliders[sampler].js_on_change('value', self._slider_callback(sampler, active_sources, sampling_sources, symMult))\
-                     for sampler in sampling_names}
+        if slider_mode == 'server':
+            slider_updates = {sampler:sample_sliders[sampler].on_change('value', self._slider_update(sampler, active_sources, sampling_source_data, symMult, live_rollover))\
+                              for sampler in sampling_names}
+        else:
+            slider_js = {sampler:sample_sliders[sampler].js_on_change('value', self._slider_callback(sampler, active_sources, sampling_sources, symMult))\
+                         for sampler in sampling_names}
         self.sample_sliders = sample_sliders
 
         toggle = Toggle(label="Lower Triangle (Toggle)", button_type="primary",max_width=300)
@@ -266,17 +383,19 @@ class ActiveExplore:
             plot.visible = cb_obj.active;
         """))
 
-        with open('exploreML/models/active_explore_js/data_toggle.js','r') as f:
-            data_toggle_js = f.read()
+        data_toggle_js = loadJS('data_toggle.js')
 
-        data_toggle = Toggle(label="Show All (Toggle)", button_type="primary",max_width=300)
+        data_toggle = Toggle(label="Show All (Toggle)", button_type="primary",max_width=300,name='data_toggle')
         self.data_toggle = data_toggle
-        data_toggle.js_on_click(CustomJS(args=dict(sliders=sample_sliders, active_dim=\
+        self.data_toggle_callback = CustomJS(args=dict(sliders=sample_sliders, active_dim=\
                                                    active_dim),
-        code=data_toggle_js))
+        code=data_toggle_js)
+        data_toggle.js_on_click(self.data_toggle_callback)
 
+        self.line_callbacks = []
         line_selects = [self._makeLineSelect(lines[0], lines[1], y_key, i, samplerCol_meta, quant_options)\
                       for i,(y_key,lines) in enumerate(zip(line_y_keys,line_plots))]
+        self.line_selects = line_selects
 
         line_tabs = [fig[-1] for fig in line_plots]
 
@@ -287,11 +406,14 @@ class ActiveExplore:
 
         linePlots = [column(*line) for line in list(zip(line_selects,line_tabs))]
 
-        radio_call = CustomJS(args=dict(methods=clust_methods,clust_dict=clust_dict,plot=p,
-                                up_source=upper_source, up_dict=upper_dict),code=radio_call_js)
+        radio_call = CustomJS(args=dict(methods=clust_methods,clust_rows=clust_sources[0],clust_cols=clust_sources[1],
+                                        plot=p),code=radio_call_js)
 
-        radio_button_group = RadioButtonGroup(labels=[x.capitalize() for x in clust_methods], active=0, max_width=300)
+        radio_button_group = RadioButtonGroup(labels=[x.capitalize() for x in clust_methods], active=0, max_width=300,
+                                              name='cluster_radio')
         radio_button_group.js_on_click(radio_call)
+        if heatmap_renderer == 'image':
+            radio_button_group.js_on_click(self._image_callback(clust_methods, clust_sources, heatmap_source))
         self.radio_button_group = radio_button_group
 
         toolbar = column(radio_button_group,toggle,sliders,data_toggle,
@@ -305,10 +427,114 @@ class ActiveExplore:
         self.toolbar = toolbar
         self.layout = layout
 
-        if file_output:
+        if file_output and slider_mode == 'server':
+            print('Server slider mode: add the layout to a Bokeh server document, {} not saved'.format(url))
+        elif file_output:
+
+            with profiler.stage('save'):
+                output_file(filename=url, title=name)
+                save(layout)
+
+    def startLive(self, tails, period=5000, doc=None):
+        """
+        Follow a running experiment, new sampler rows are polled every period ms and streamed into the dashboard
+        tails: {sampler: ActiveH5Tail or ActiveParquetTail} reading the rows appended since the last poll
+        doc: Bokeh server document holding the layout (curdoc() by default)
+        Sliders at their end follow the new rows, slider_mode 'server' is required
+        The tails are first advanced past the rows the dashboard already shows, so a dashboard built from the
+        start of the file, e.g. from loadActiveH5(fname), only receives the rows appended after it
+        """
+        if self.slider_mode != 'server':
+            raise ValueError("Live mode requires slider_mode='server', not '{}'".format(self.slider_mode))
+
+        for sampler, tail in tails.items():
+            tail.skip(len(next(iter(self.sampling_source_data[sampler].values()))) // self.symMult)
 
-            output_file(filename=url, title=name)
-            save(layout)
+        doc = doc if doc is not None else curdoc()
+        self.live_callback = doc.add_periodic_callback(lambda: self._liveUpdate(tails), period)
+
+        return self.live_callback
+
+    def _liveUpdate(self, tails):
+        """
+        Append the new rows of every sampler, then extend the sliders, axis ranges and column metadata
+        """
+        grown = False
+        for sampler, tail in tails.items():
+            new_rows = tail.read()
+            if new_rows is None or new_rows.shape[0] == 0:
+                continue
+
+            if self.is_sym:
+                new_rows = self._makeSymAL(new_rows, **self.sampler_cols)
+            new_rows = self._addIndexCols(new_rows, self.df_index, self.df_cols, self.meta_vars)
+            new_data = encodeSourceData(new_rows, self.encoding, self.factor_tables)
+
+            self._appendLiveData(sampler, new_data)
+
+            stats = self.sampler_stats[sampler]
+            self.sampler_stats[sampler] = ColumnStats(stats.columns).merge(stats).update(new_rows)
+            grown = True
+
+        if not grown:
+            return
+
+        active_dim = max(len(next(iter(data.values()))) for data in self.sampling_source_data.values()) // self.symMult
+        samplerCol_meta = mergeStats(self.sampler_stats.values()).meta()
+        self.samplerCol_meta = samplerCol_meta
+
+        for callback in self.line_callbacks:
+            callback.args = dict(callback.args, col_meta=samplerCol_meta)
+        self.data_toggle_callback.args = dict(self.data_toggle_callback.args, active_dim=active_dim)
+
+        active_x = self.sampler_cols['active_col']
+        for line_select, (figs, _, _) in zip(self.line_selects, self.line_plots):
+            y_meta = samplerCol_meta[line_select.value]
+            for fig in figs:
+                fig.x_range.end = samplerCol_meta[active_x]['max']*1.05
+                fig.y_range.update(start=y_meta['min'] - y_meta['max']*0.02, end=y_meta['max'] + y_meta['max']*0.05)
+
+        # Sliders at their end follow the experiment, the slider callbacks stream the new rows
+        for slider in self.sample_sliders.values():
+            following = slider.value >= slider.end
+            slider.end = active_dim
+            if following:
+                slider.value = active_dim
+        self.active_dim = active_dim
+
+    def _appendLiveData(self, sampler, new_data):
+        """
+        Append encoded rows to the data of a sampler in amortized O(new rows)
+        The data may be shared with other panels, so it is first copied into lists and capacity doubling arrays
+        owned by this panel, the sampler data then holds views of the filled rows
+        """
+        if self.live_buffers is None:
+            self.live_buffers = {}
+        if sampler not in self.live_buffers:
+            source_data = self.sampling_source_data[sampler]
+            self.live_buffers[sampler] = {key:list(values) if isinstance(values, list) else np.array(values)\
+                                          for key,values in source_data.items()}
+            self.sampling_source_data[sampler] = {key:values if isinstance(values, list) else values[:]\
+                                                  for key,values in self.live_buffers[sampler].items()}
+
+        buffers = self.live_buffers[sampler]
+        source_data = self.sampling_source_data[sampler]
+        n_rows = len(next(iter(source_data.values())))
+
+        for key,values in new_data.items():
+            buffer = buffers[key]
+            if isinstance(buffer, list):
+                buffer.extend(values)
+                continue
+
+            values = np.asarray(values)
+            n_total = n_rows + len(values)
+            if n_total > len(buffer) or not np.can_cast(values.dtype, buffer.dtype):
+                grown = np.empty(max(2*len(buffer), n_total), dtype=np.result_type(buffer.dtype, values.dtype))
+                grown[:n_rows] = buffer[:n_rows]
+                buffers[key] = buffer = grown
+            buffer[n_rows:n_total] = values
+            source_data[key] = buffer[:n_total]
 
     def _make_layout(self, heatmap_layout, linePlots, plot_location):
 
@@ -335,7 +561,39 @@ class ActiveExplore:
     def _slider_callback(self, sampler, active_sources, sampling_sources, symMult):
         callback = CustomJS(args=dict(slide_source=active_sources[sampler],
                                          active_all=sampling_sources[sampler],
-                                         symMult=symMult), code=slider_callback_js)
+                                         symMult=symMult), code=loadJS('slider_callback.js'))
+
+        return callback
+
+    def _slider_update(self, sampler, active_sources, sampling_source_data, symMult, rollover=None):
+        """
+        Server side slider callback, streams the added rows or truncates to the new slider value
+        rollover: only keep the last rollover rows in the active source
+        The sampler data is looked up on every call, so live updates can replace it
+        """
+        active_source = active_sources[sampler]
+        window = {'end':0}
+
+        def update(attrname, old, new):
+            source_data = sampling_source_data[sampler]
+            n_active = window['end']
+            n_new = int(min(new*symMult, len(next(iter(source_data.values())))))
+
+            if n_new > n_active:
+                active_source.stream({key:values[n_active:n_new] for key,values in source_data.items()}, rollover=rollover)
+            elif n_new < n_active:
+                start = 0 if rollover is None else max(0, n_new - rollover)
+                active_source.data = {key:values[start:n_new] for key,values in source_data.items()}
+            window['end'] = n_new
+
+        return update
+
+    def _image_callback(self, clust_methods, clust_sources, image_source):
+
+        image_reorder_js = loadJS('image_reorder.js')
+
+        callback = CustomJS(args=dict(methods=clust_methods, clust_rows=clust_sources[0], clust_cols=clust_sources[1],
+                                      img_source=image_source), code=image_reorder_js)
 
         return callback
 
@@ -347,14 +605,15 @@ class ActiveExplore:
                                       col_meta=samplerCol_meta,
                                       yaxis=Fig.yaxis[0],
                                       yaxis2=Fig2.yaxis[0]),
-                                      code=line_callback_js)
+                                      code=loadJS('line_callback.js'))
+        self.line_callbacks.append(callback)
 
         return callback
 
     def _makeLineSelect(self, Fig, Figs, y_key, i, samplerCol_meta, quant_options):
 
         line_select = Select(title="Plot {}:".format(i+1), value=y_key,
-                             options=quant_options)
+                             options=quant_options, name='line_select_{}'.format(i))
         line_select.js_on_change("value", self._line_callback(Fig[0], Fig[1], Figs[0], Figs[1], samplerCol_meta))
 
         return line_select
@@ -430,28 +689,79 @@ class ActiveExplore:
     def _makeSymAL(self, df, row_idx, col_idx, active_col, batch_col):
         """
         Makes active learning dataframe symmetrical
+        Each sample is directly followed by its mirrored sample, interleaved by index arithmetic
         """
+        active = df[active_col].values
+        batch = df[batch_col].values
+
+        # Samples are normally recorded in iteration order, only sort (stably) when they are not
+        in_order = np.all((active[1:] > active[:-1]) | ((active[1:] == active[:-1]) & (batch[1:] >= batch[:-1])))
+        if not in_order:
+            df = df.iloc[np.lexsort((batch, active))]
 
-        sym_df = pd.concat([df,df.rename({row_idx:col_idx,col_idx:row_idx},axis=1)],axis=0)\
-        .sort_values([active_col,batch_col],axis=0)
+        sym_data = {col:np.repeat(df[col].values, 2) for col in df.columns}
+        sym_data[row_idx][1::2] = df[col_idx].values
+        sym_data[col_idx][1::2] = df[row_idx].values
+
+        sym_df = pd.DataFrame(sym_data, index=np.repeat(df.index, 2))
 
         return sym_df
 
-    def _makeClustIndex(self, df, clust_method):
+    def _samplerStats(self, df, data):
+        """
+        Column statistics of a sampler, read from df.attrs['column_stats'] when they still describe its rows
+        df: sampler frame as given, data: the frame after the symmetric expansion and index columns
+        """
+        stats = df.attrs.get('column_stats')
+        if stats is not None and stats.rows == df.shape[0]:
+            if self.is_sym:
+                stats = stats.mirrored(self.sampler_cols['row_idx'], self.sampler_cols['col_idx'])
+            if stats.columns == data.select_dtypes(include='number').columns.tolist():
+                return stats
+
+        return ColumnStats.fromFrame(data)
+
+    def _shared(self, kind, parts, factory):
+        """
+        Item from the source registry when given, so identical panels reuse it
+        """
+        if self.source_registry is None:
+            return factory()
+        return self.source_registry.get(kind, parts, factory)
+
+    def _makeClustDict(self, df, clust_methods, clust_cache=None, clust_workers=None):
+        """
+        Make indices for all cluster methods, linkages run in a process pool when clust_workers is given
+        """
+        leaves = {}
+        if clust_workers is not None:
+            leaves, timings = parallelLeaves(df, [method for method in clust_methods if method != 'None'],
+                                             clust_cache, clust_workers, self.clust_options)
+            self.clust_timings.update(timings)
+
+        return {method:self._makeClustIndex(df, method, clust_cache, leaves.get(method)) for method in clust_methods}
+
+    def _makeClustIndex(self, df, clust_method, clust_cache=None, leaves=None):
         """
         # Make indices for each cluster method
         """
+        cached = leaves
+        if cached is None and clust_method != 'None' and clust_cache is not None:
+            cache_key = clust_cache.key(df, cacheMethod(clust_method, self.clust_options))
+            cached = clust_cache.get(cache_key)
+
         if clust_method == 'None':
             row_clust_index = np.arange(df.shape[0]).tolist()
             col_clust_index = np.arange(df.shape[1]).tolist()
+        elif cached is not None:
+            row_clust_index, col_clust_index = cached
         else:
             try:
-                row_linkages = linkage(df,method=clust_method)
-                col_linkages = linkage(df.T,method=clust_method)
-                row_dendrogram = dendrogram(row_linkages, no_plot=True)
-                col_dendrogram = dendrogram(col_linkages, no_plot=True)
-                row_clust_index = row_dendrogram['leaves']
-                col_clust_index = col_dendrogram['leaves']
+                values = matrixValues(df)
+                row_clust_index, self.clust_timings[(clust_method, 'row')] = linkageLeaves(values, clust_method, **self.clust_options)
+                col_clust_index, self.clust_timings[(clust_method, 'col')] = linkageLeaves(values.T, clust_method, **self.clust_options)
+                if clust_cache is not None:
+                    clust_cache.put(cache_key, row_clust_index, col_clust_index)
             except ValueError:
                 print('ValueError: Invalid method given')
 
@@ -460,19 +770,63 @@ class ActiveExplore:
         col_range = df.columns.values[col_clust_index].tolist()
         return [row_clust_index, col_clust_index, row_range, col_range]
 
-    def _makeGImatrix(self, df, meta_vars):
+    def _makeLongData(self, df, meta_vars, encoding, subsets):
         """
-        Make melted GI dataframes for a given cluster index
+        Long format (melted) GI source data for each boolean subset of the matrix entries (None for all)
+        The row/col arrays are built once in melt order and every subset is selected from them
+        """
+
+        n_rows, n_cols = df.shape
+        values = df.values.ravel(order='F')
+        row_pos = np.tile(np.arange(n_rows, dtype=np.int32), n_cols)
+        col_pos = np.repeat(np.arange(n_cols, dtype=np.int32), n_rows)
+
+        long_data = {}
+        for name, subset in subsets.items():
+            selection = slice(None) if subset is None else np.asarray(subset).ravel(order='F')
+            long_data[name] = self._encodeLongData(row_pos[selection], col_pos[selection], values[selection],
+                                                   df.index, df.columns, meta_vars, encoding)
+
+        return long_data
+
+    def _makeSparseLongData(self, M, S_train, index, cols, meta_vars, encoding, heatmap=True):
+        """
+        Long format GI source data of the stored entries of a sparse M, and of the training entries of S_train
+        """
+
+        long_data = {}
+        if heatmap:
+            # Column major like the dense melt
+            entries = M.tocsc().tocoo()
+            long_data['heatmap'] = self._encodeLongData(entries.row, entries.col, entries.data,
+                                                        index, cols, meta_vars, encoding)
+
+        train = S_train.tocsc()
+        train.eliminate_zeros()
+        train = train.tocoo()
+        train_values = np.asarray(M[train.row, train.col]).ravel()
+        observed = ~np.isnan(train_values)
+        long_data['train'] = self._encodeLongData(train.row[observed], train.col[observed], train_values[observed],
+                                                  index, cols, meta_vars, encoding)
+
+        return long_data
+
+    def _encodeLongData(self, row_pos, col_pos, values, index, cols, meta_vars, encoding):
+        """
+        Source data of matrix entries given by their row/col positions
         """
 
         rowName = meta_vars['rowName']
         colName = meta_vars['colName']
         valName = meta_vars['valName']
 
-        gi_matrix = df.melt(var_name=colName, value_name=valName, ignore_index=False)\
-        .rename_axis(rowName).reset_index()
+        if encoding == 'binary':
+            # Positions are the factor codes of the index/columns
+            return {rowName:compactArray(row_pos), colName:compactArray(col_pos), valName:compactArray(values)}
+        elif encoding == 'list':
+            return {rowName:index.values[row_pos].tolist(), colName:cols.values[col_pos].tolist(), valName:values.tolist()}
 
-        return gi_matrix
+        raise ValueError('Invalid encoding given: {}'.format(encoding))
 
     def _addIndexCols(self, df, index, cols, meta_vars):
         """
@@ -488,7 +842,3 @@ class ActiveExplore:
         data = df.assign(**kwargs)
 
         return data
-
-    def _makeMaskUpper(self,df):
-        mask_up = np.triu(np.ones(df.shape),1).astype(bool)
-        return df.where(mask_up)
@@ -0,0 +1,45 @@
+console.log('radio_button_group: active=' + this.active, this.toString())
+
+//Store radioVal for clustering methods
+let radioVal = cb_obj.active;
+let method = methods[radioVal];
+
+const data = img_source.data;
+const image = data.image[0];
+const row_order = data.row_order[0];
+const col_order = data.col_order[0];
+const n_rows = row_order.length;
+const n_cols = col_order.length;
+
+// Image rows are stacked bottom to top, matching the reversed y range
+const new_rows = Array.from(clust_rows.data[method + '|index']).reverse();
+const new_cols = clust_cols.data[method + '|index'];
+
+// Current position of each matrix row/col in the image
+const row_pos = new Int32Array(n_rows);
+const col_pos = new Int32Array(n_cols);
+for (let i = 0; i < n_rows; i++) {
+  row_pos[row_order[i]] = i;
+}
+for (let j = 0; j < n_cols; j++) {
+  col_pos[col_order[j]] = j;
+}
+
+// Reorder the image in place
+const old_image = new Float32Array(image);
+for (let i = 0; i < n_rows; i++) {
+  const src = row_pos[new_rows[i]] * n_cols;
+  const dst = i * n_cols;
+  for (let j = 0; j < n_cols; j++) {
+    image[dst + j] = old_image[src + col_pos[new_cols[j]]];
+  }
+}
+
+for (let i = 0; i < n_rows; i++) {
+  row_order[i] = new_rows[i];
+}
+for (let j = 0; j < n_cols; j++) {
+  col_order[j] = new_cols[j];
+}
+
+img_source.change.emit();
@@ -0,0 +1,84 @@
+// Selected sampler, map and slider value
+const sampler = samplers[radio_sampler.active];
+const slider_val = sliders[sampler].value;
+let pred_map = predmap_labels[radio_map.active];
+
+if (!(pred_map in map_iters[sampler])) {
+  // If prediction type not in current sampling type, reset radio button (re-runs this callback)
+  radio_map.active = predmap_labels.indexOf(init_field);
+  return;
+}
+
+// Stored iteration at or below the slider value
+function iteration(map) {
+  const iters = map_iters[sampler][map];
+  if (constant_map.includes(map)) {
+    return iters[0];
+  }
+  let iter = iters[0];
+  for (const it of iters) {
+    if (Number(it) <= slider_val) {
+      iter = it;
+    }
+  }
+  return iter;
+}
+
+// Map values for every entry of pred_ds, repeated for the mirrored half when symmetric
+// Constant maps are packed once, without an iteration
+function values(map) {
+  const key = constant_map.includes(map) ? sampler + '|' + map : sampler + '|' + map + '|' + iteration(map);
+  const stored = maps.data[key];
+  if (!is_sym) {
+    return stored;
+  }
+  const full = new Float32Array(2 * stored.length);
+  full.set(stored);
+  full.set(stored, stored.length);
+  return full;
+}
+
+const new_data = Object.assign({}, pred_ds.data);
+for (const map of Object.keys(map_iters[sampler])) {
+  new_data[map] = values(map);
+}
+new_data.entry_color = new_data[pred_map];
+pred_ds.data = new_data;
+
+// Update colorbar
+const bounds = (pred_map in fixed_bounds) ? fixed_bounds[pred_map] : map_bounds[sampler][pred_map][iteration(pred_map)];
+color_mapper.palette = palettes[pred_map];
+color_mapper.low = bounds[0];
+color_mapper.high = bounds[1];
+
+const title = pred_map.charAt(0).toUpperCase() + pred_map.slice(1);
+manifold_plot.title.text = title + ' Manifold';
+heatmap_plot.title.text = title + ' Heatmap';
+
+if (img_source !== null) {
+  // Scatter the entries into the heatmap image, keeping its current cluster order
+  const data = img_source.data;
+  const image = data.image[0];
+  const row_order = data.row_order[0];
+  const col_order = data.col_order[0];
+  const n_cols = col_order.length;
+
+  const row_pos = new Int32Array(row_order.length);
+  const col_pos = new Int32Array(n_cols);
+  for (let i = 0; i < row_order.length; i++) {
+    row_pos[row_order[i]] = i;
+  }
+  for (let j = 0; j < n_cols; j++) {
+    col_pos[col_order[j]] = j;
+  }
+
+  const row_coord = new_data.row_coord;
+  const col_coord = new_data.col_coord;
+  const entry_color = new_data.entry_color;
+  image.fill(NaN);
+  for (let k = 0; k < entry_color.length; k++) {
+    image[row_pos[row_coord[k]] * n_cols + col_pos[col_coord[k]]] = entry_color[k];
+  }
+
+  img_source.change.emit();
+}
@@ -3,22 +3,35 @@ var data = slide_source.data;
 const keys = Object.keys(data);
 var keysLength = keys.length;
 
-var active_map = new Map();
-var all_map = new Map();
+// Plain typed array constructors, binary columns arrive as NDArray subclasses of these
+// whose subarray() does not produce a proper view
+const typedArrays = [Float32Array, Float64Array, Int8Array, Uint8Array,
+                     Int16Array, Uint16Array, Int32Array, Uint32Array];
 
 for (var i = 0; i < keysLength; i++) {
 
-  // Assign each key in the slide source to a map variable
-  active_map.set(keys[i], data[keys[i]]);
+  var all = active_all.data[keys[i]];
+  var active = data[keys[i]];
+  var n_new = Math.min(slideVal*symMult, all.length);
 
-  // Set all data to the current slice
-  all_map.set(keys[i], active_all.data[keys[i]].slice(0,slideVal*symMult));
+  var typedArray = typedArrays.find(function (T) { return all instanceof T; });
 
-  // Clear active map array
-  active_map.get(keys[i]).splice(0, active_map.get(keys[i]).length);
+  if (typedArray !== undefined) {
+    // Typed columns show a view on the first n_new rows, no copy needed
+    data[keys[i]] = new typedArray(all.buffer, all.byteOffset, n_new);
+  } else {
+    var n_active = active.length;
 
-  // Assign new data to active map
-  active_map.set(keys[i], active_map.get(keys[i]).push(...all_map.get(keys[i])));
+    if (n_new > n_active) {
+      // Append only the rows between the old and the new slider value
+      for (var j = n_active; j < n_new; j++) {
+        active.push(all[j]);
+      }
+    } else {
+      // Truncate to the new slider value
+      active.length = n_new;
+    }
+  }
 }
 
 slide_source.change.emit();
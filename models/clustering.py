@@ -0,0 +1,264 @@
+import os
+import time
+import hashlib
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from scipy import sparse
+
+class ClustCache:
+
+    """
+    Persistent, content addressed cache of the row/col leaf orderings of _makeClustIndex
+
+    Args:
+    cache_dir: directory of the cache, e.g. a clust_cache folder next to the H5 data
+    max_entries: maximum number of cached orderings, the least recently used are evicted first
+    max_bytes: maximum total size of the cache on disk in bytes (None for no bound)
+    """
+
+    def __init__(self, cache_dir, max_entries=128, max_bytes=None):
+
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, df, clust_method):
+        """
+        Hash of the matrix values, index, columns and the cluster method
+        """
+        values = matrixValues(df)
+
+        h = hashlib.sha1()
+        h.update(str((values.dtype.str, values.shape, clust_method)).encode())
+        if sparse.issparse(values):
+            values = values.tocoo()
+            for part in [values.row, values.col, values.data]:
+                h.update(np.ascontiguousarray(part).tobytes())
+        else:
+            h.update(np.ascontiguousarray(values).tobytes())
+        h.update('\x00'.join(map(str, df.index)).encode())
+        h.update('\x00'.join(map(str, df.columns)).encode())
+
+        return h.hexdigest()
+
+    def get(self, key):
+        """
+        Cached [row_leaves, col_leaves] for a key, None when missing
+        """
+        path = self._path(key)
+        try:
+            with np.load(path) as f:
+                leaves = [f['row'].tolist(), f['col'].tolist()]
+        except (OSError, KeyError, ValueError):
+            return None
+
+        # Mark as recently used
+        os.utime(path)
+
+        return leaves
+
+    def put(self, key, row_leaves, col_leaves):
+        """
+        Store the leaf orderings for a key and evict down to the size bounds
+        """
+        path = self._path(key)
+        tmp_path = path + '.tmp.npz'
+
+        np.savez(tmp_path, row=np.asarray(row_leaves, dtype=np.int64), col=np.asarray(col_leaves, dtype=np.int64))
+        os.replace(tmp_path, path)
+
+        self._evict()
+
+    def clear(self):
+        for path, _, _ in self._entries():
+            os.remove(path)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + '.npz')
+
+    def _entries(self):
+        """
+        Cached files as (path, size, last used), most recently used first
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.npz') or name.endswith('.tmp.npz'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+
+        return sorted(entries, key=lambda entry: entry[2], reverse=True)
+
+    def _evict(self):
+        total_bytes = 0
+        for i, (path, size, _) in enumerate(self._entries()):
+            total_bytes += size
+            over_bytes = self.max_bytes is not None and total_bytes > self.max_bytes
+            if i >= self.max_entries or over_bytes:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+def matrixValues(df):
+    """
+    Values of a dataframe, as a CSR matrix when it holds sparse columns
+    """
+    if hasattr(df, 'sparse'):
+        return df.sparse.to_coo().tocsr()
+    return df.values
+
+def linkageLeaves(values, clust_method, clust_backend='linkage', sample_size=2000, sampling='random', seed=0):
+    """
+    Leaf ordering of the rows of a matrix, with the wall time it took
+    clust_backend: 'linkage' for the full dendrogram,
+                   'sampled' for linkage on sample_size rows (sampling 'random' or 'kmeans' centroids)
+                   with the remaining rows placed beside their nearest sampled row,
+                   'spectral' for a rank one seriation that ignores clust_method
+    Sparse values are only kept sparse by the 'spectral' backend
+    """
+    from scipy.cluster.hierarchy import linkage, dendrogram
+
+    start = time.perf_counter()
+    if sparse.issparse(values) and clust_backend == 'spectral':
+        values = values.astype(float)
+    elif sparse.issparse(values):
+        values = values.toarray().astype(float)
+    else:
+        values = np.asarray(values, dtype=float)
+
+    if clust_backend == 'linkage' or (clust_backend == 'sampled' and values.shape[0] <= sample_size):
+        leaves = dendrogram(linkage(values, method=clust_method), no_plot=True)['leaves']
+    elif clust_backend == 'sampled':
+        leaves = _sampledLeaves(values, clust_method, sample_size, sampling, seed)
+    elif clust_backend == 'spectral':
+        leaves = _spectralLeaves(values)
+    else:
+        raise ValueError('Invalid clustering backend given: {}'.format(clust_backend))
+
+    return leaves, time.perf_counter() - start
+
+def cacheMethod(clust_method, clust_options=None):
+    """
+    Cluster method as hashed by ClustCache, including the backend options when not the full linkage
+    """
+    if not clust_options or clust_options.get('clust_backend', 'linkage') == 'linkage':
+        return clust_method
+
+    return (clust_method, tuple(sorted(clust_options.items())))
+
+def _sampledLeaves(values, clust_method, sample_size, sampling, seed):
+    """
+    Linkage on a subset of the rows, every row placed at the leaf of its nearest subset row
+    """
+    from scipy.cluster.hierarchy import linkage, dendrogram
+    from scipy.cluster.vq import kmeans2
+
+    if sampling == 'kmeans':
+        subset, _ = kmeans2(values, sample_size, seed=seed, minit='++')
+    elif sampling == 'random':
+        rng = np.random.default_rng(seed)
+        subset = values[rng.choice(values.shape[0], sample_size, replace=False)]
+    else:
+        raise ValueError('Invalid sampling given: {}'.format(sampling))
+
+    subset_leaves = dendrogram(linkage(subset, method=clust_method), no_plot=True)['leaves']
+    leaf_position = np.empty(len(subset_leaves), dtype=np.int64)
+    leaf_position[subset_leaves] = np.arange(len(subset_leaves))
+
+    nearest, distance = _nearestRows(values, subset)
+
+    # Rows sharing a leaf are ordered by their distance to it
+    return np.lexsort((distance, leaf_position[nearest])).tolist()
+
+def _nearestRows(values, subset, chunk_elements=2**24):
+    """
+    Index of and squared euclidean distance to the nearest subset row, computed in row chunks
+    """
+    subset_norms = (subset**2).sum(axis=1)
+    chunk_size = max(1, chunk_elements // subset.shape[0])
+
+    nearest = np.empty(values.shape[0], dtype=np.int64)
+    distance = np.empty(values.shape[0])
+    for start in range(0, values.shape[0], chunk_size):
+        chunk = values[start:start+chunk_size]
+        chunk_distance = (chunk**2).sum(axis=1)[:, None] - 2*chunk @ subset.T + subset_norms[None, :]
+        nearest[start:start+chunk_size] = chunk_distance.argmin(axis=1)
+        distance[start:start+chunk_size] = chunk_distance[np.arange(chunk.shape[0]), nearest[start:start+chunk_size]]
+
+    return nearest, distance
+
+def _spectralLeaves(values):
+    """
+    Rows sorted by their score on the leading singular vector of the column centred matrix
+    Sparse matrices are centred implicitly, so they are never densified
+    """
+    from scipy.sparse.linalg import svds, LinearOperator
+
+    if sparse.issparse(values):
+        mean = np.asarray(values.mean(axis=0)).ravel()
+        centred = LinearOperator(values.shape, dtype=float,
+                                 matvec=lambda v: values @ np.ravel(v) - mean @ np.ravel(v),
+                                 rmatvec=lambda u: values.T @ np.ravel(u) - mean * np.sum(u))
+    else:
+        centred = values - values.mean(axis=0)
+
+    if min(centred.shape) > 2:
+        u, _, _ = svds(centred, k=1, v0=np.ones(min(centred.shape)))
+    else:
+        u, _, _ = np.linalg.svd(centred, full_matrices=False)
+    score = u[:, 0]
+
+    # Fix the sign so the ordering is deterministic
+    if score[np.abs(score).argmax()] < 0:
+        score = -score
+
+    return np.argsort(score, kind='stable').tolist()
+
+def parallelLeaves(df, clust_methods, clust_cache=None, max_workers=None, clust_options=None):
+    """
+    Row/col leaf orderings for each cluster method, with every (method, axis) linkage run in a process pool
+    Returns the {method: [row_leaves, col_leaves]} orderings and the {(method, axis): seconds} task wall times
+    """
+    clust_options = clust_options or {}
+    leaves = {}
+    cache_keys = {}
+    for method in clust_methods:
+        if clust_cache is not None:
+            cache_keys[method] = clust_cache.key(df, cacheMethod(method, clust_options))
+            cached = clust_cache.get(cache_keys[method])
+            if cached is not None:
+                leaves[method] = cached
+
+    pending = [method for method in clust_methods if method not in leaves]
+    if not pending:
+        return leaves, {}
+
+    values = matrixValues(df)
+    tasks = {}
+    timings = {}
+    axis_leaves = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for method in pending:
+            tasks[(method, 'row')] = executor.submit(linkageLeaves, values, method, **clust_options)
+            tasks[(method, 'col')] = executor.submit(linkageLeaves, values.T, method, **clust_options)
+
+        for task, future in tasks.items():
+            try:
+                axis_leaves[task], timings[task] = future.result()
+            except ValueError:
+                print('ValueError: Invalid method given')
+
+    for method in pending:
+        if (method, 'row') in axis_leaves and (method, 'col') in axis_leaves:
+            leaves[method] = [axis_leaves[(method, 'row')], axis_leaves[(method, 'col')]]
+            if clust_cache is not None:
+                clust_cache.put(cache_keys[method], *leaves[method])
+
+    return leaves, timings
@@ -1,12 +1,14 @@
 import numpy as np
 import pandas as pd
-import seaborn as sns
-from holoviews.plotting.util import process_cmap
 from bokeh.layouts import column, row
 from bokeh.models import ColorBar, LogColorMapper, LinearColorMapper, ColumnDataSource, RadioGroup, RadioButtonGroup,\
-                         BasicTicker, HoverTool, Div, CustomJS
+                         BasicTicker, HoverTool, Div, CustomJS, Range1d
+from bokeh.events import RangesUpdate
 from bokeh.plotting import Figure
 from itertools import count
+from .utils import loadJS, makeImageData, makeClustData, rangeFormatters
+from .snapshots import SnapshotFrame, compressSnapshots
+from .profiling import BuildProfiler
 
 class PredictMap:
 
@@ -14,34 +16,56 @@ class PredictMap:
     Args:
     pred_df:
     pred_dict:
+    heatmap_renderer: 'rect' for one glyph per matrix entry or 'image' for a single image of the reordered matrix
+    standalone: switch the maps with JS callbacks instead of Python ones, so the layout can be saved as static HTML
+    snapshot_dtype: store the map iterations as 'uint8' (quantized per column) or 'float16' snapshots (None to keep the frames)
+    snapshot_stride: keep every snapshot_stride-th slider step of the maps, the steps in between are interpolated
+    manifold_lod: number of visible manifold points above which a density grid is drawn instead of the points,
+                  the view is refreshed on every pan/zoom (None to draw every point, Bokeh server only)
+    manifold_bins: grid resolution of the manifold density along each axis
+    profiler: BuildProfiler recording the wall time and peak memory of the build stages
     """
 
     def __init__(self, pred_df, predmap_dict, toolbar=None, predmap_init_field='prediction', mapdictInit='random',
-                 map_q_low=0,map_q_high=100,clust_dict=None,clust_methods=None,init_clust='None',
-                 upper_source=None,upper_dict=None,constant_map=['density'],radio_button_group=None,
+                 map_q_low=0,map_q_high=100,clust_dict=None,clust_sources=None,clust_methods=None,init_clust='None',
+                 upper_source=None,constant_map=['density'],radio_button_group=None,
                  row_name='dim1',col_name='dim2',sample_sliders=None,hide_heatmap_labels=True,
-                 plot_size=400,is_sym=True,toggle=None,data_toggle=None,active_dim=None):
-
-        pred_df = self._addSym(pred_df,True,True)
-        map_dict = {}
-        for key1,val1 in predmap_dict.items():
-            map_dict[key1] = {}
-            for key2 in val1.keys():
-                map_dict[key1][key2] = self._addSym(predmap_dict[key1][key2],False,False)
+                 plot_size=400,is_sym=True,toggle=None,data_toggle=None,active_dim=None,
+                 heatmap_renderer='rect',standalone=False,snapshot_dtype=None,snapshot_stride=1,
+                 manifold_lod=None,manifold_bins=256,profiler=None):
+
+        profiler = profiler if profiler is not None else BuildProfiler(enabled=False)
+        self.profiler = profiler
+
+        # Map frames keep only the stored half, the mirrored half of symmetric experiments repeats its values
+        self.is_sym = is_sym
+        with profiler.stage('sym_expansion'):
+            if is_sym:
+                pred_df = self._addSym(pred_df,True,True)
+        map_dict = predmap_dict
+        if snapshot_dtype is not None or snapshot_stride > 1:
+            with profiler.stage('snapshots'):
+                map_dict = compressSnapshots(predmap_dict, snapshot_dtype or 'float32', snapshot_stride)
+        self.map_dict = map_dict
 
         predmap_labels = ["prediction", "uncertainty", "density", "similarity"]
 
         # Create predmap datasource
         # Assign column for entry color on prediction maps
         predmap_ds = map_dict[mapdictInit][predmap_init_field]
-        pred_df_init = pred_df.assign(entry_color=predmap_ds.loc[:,'0'].values)\
-                              .assign(**{k:v.loc[:,'0'].values for k,v in map_dict[mapdictInit].items()})
-        pred_ds = ColumnDataSource(pred_df_init)
+        with profiler.stage('sources'):
+            pred_df_init = pred_df.assign(entry_color=self._mapValues(predmap_ds,'0'))\
+                                  .assign(**{k:self._mapValues(v,'0') for k,v in map_dict[mapdictInit].items()})
+            pred_ds = ColumnDataSource(pred_df_init)
 
         # Create lists/dicts for color palettes and labels
         slider_labels_dict = dict(zip(sample_sliders.keys(),count()))
         slider_key_dict = dict(enumerate(sample_sliders.keys()))
 
+        # Imported here, seaborn and holoviews take seconds to import and are only needed for the palettes
+        import seaborn as sns
+        from holoviews.plotting.util import process_cmap
+
         heatmap_colors = sns.diverging_palette(260, 10, n=256).as_hex()
         heatmap_colors2 = process_cmap('cet_CET_L17')
 
@@ -58,6 +82,18 @@ class PredictMap:
 
         map_bounds = ColumnDataSource(map_bounds)
 
+        # Low/high percentile bounds of every (sampler, map, iteration), one vectorized pass per map
+        with profiler.stage('bounds'):
+            bounds_table = {sampler:{k:self._mapPercentiles(v,[map_q_low,map_q_high]) for k,v in maps.items()}\
+                            for sampler,maps in map_dict.items()}
+        self.bounds_table = bounds_table
+
+        def slider_bounds(curr_map_dict, slider_val):
+            bounds = {k:v.loc[:,slider_val if k not in constant_map else '0'].tolist()\
+                      for k,v in bounds_table[curr_map_dict].items()}
+            bounds['prediction'] = [-0.3,0.3]
+            return bounds
+
         predmap_mapper = LinearColorMapper(palette=predmap_palette_dict[predmap_init_field],
                                            low=map_bounds.data[predmap_init_field][0],
                                            high=map_bounds.data[predmap_init_field][1])
@@ -90,34 +126,71 @@ class PredictMap:
 
         p3.add_layout(predmap_color_bar, "right")
 
-        heatFig = p3.rect(x=col_name, y=row_name, width=1,height=1,
-                          source=pred_ds,
-                          color={'field':'entry_color', 'transform': predmap_mapper})
-
         predmap_tooltips = [('index', '@{} | @{}'.format(row_name,col_name)),
                                 ('density', '@{}'.format('density')),
                                 ('similarity', '@{}'.format('similarity')),
                                 ('uncertainty', '@{}'.format('uncertainty')),
                                 ('prediction', '@{}'.format('prediction'))]
-        p3.add_tools(
-            HoverTool(
-                      tooltips=predmap_tooltips,
-                      mode='mouse',
-                      renderers=[heatFig]
+
+        if heatmap_renderer == 'image':
+            matrix_shape = (len(clust_dict[init_clust][0]), len(clust_dict[init_clust][1]))
+
+            def image_data(entry_values):
+                # Scatter the entries into the matrix, ordered by the currently selected clustering
+                matrix = np.full(matrix_shape, np.nan, dtype=np.float32)
+                matrix[pred_df['row_coord'].values, pred_df['col_coord'].values] = entry_values
+                clust_index = clust_dict[clust_methods[radio_button_group.active]]
+                return makeImageData(matrix, clust_index[0], clust_index[1])
+
+            image_source = ColumnDataSource(image_data(pred_ds.data['entry_color']))
+            heatFig = p3.image(image='image', x=0, y=0, dw=matrix_shape[1], dh=matrix_shape[0],
+                               source=image_source, color_mapper=predmap_mapper)
+            p3.add_tools(
+                HoverTool(
+                          tooltips=[('index', '$y{custom} | $x{custom}'),('value', '@image')],
+                          formatters=rangeFormatters(p3),
+                          mode='mouse',
+                          renderers=[heatFig]
+                )
+            )
+        else:
+            heatFig = p3.rect(x=col_name, y=row_name, width=1,height=1,
+                              source=pred_ds,
+                              color={'field':'entry_color', 'transform': predmap_mapper})
+            p3.add_tools(
+                HoverTool(
+                          tooltips=predmap_tooltips,
+                          mode='mouse',
+                          renderers=[heatFig]
+                )
             )
-        )
+
+        def update_heatmap():
+            if heatmap_renderer == 'image':
+                image_source.data = image_data(pred_ds.data['entry_color'])
+            if manifold_lod is not None:
+                update_manifold()
 
         # Upper mask
-        upperFig2 = p3.rect(x=col_name, y=row_name, source=upper_source, height=1, width=1, color="white")
+        upperFig2 = p3.patch(x='x', y='y', source=upper_source, color="white", line_color=None)
         upperFig2.visible = False
 
-        with open('exploreML/models/active_explore_js/radio_call.js','r') as f:
-            radio_call_js = f.read()
+        radio_call_js = loadJS('radio_call.js')
+
+        # Shared with the ActiveExplore callbacks when given
+        if clust_sources is None:
+            clust_sources = tuple(ColumnDataSource(data) for data in makeClustData(clust_dict))
 
-        radio_call2 = CustomJS(args=dict(methods=clust_methods,clust_dict=clust_dict,plot=p3,
-                                up_source=upper_source, up_dict=upper_dict),code=radio_call_js)
+        radio_call2 = CustomJS(args=dict(methods=clust_methods,clust_rows=clust_sources[0],clust_cols=clust_sources[1],
+                                         plot=p3),code=radio_call_js)
 
         radio_button_group.js_on_click(radio_call2)
+        if heatmap_renderer == 'image':
+            image_reorder_js = loadJS('image_reorder.js')
+
+            radio_button_group.js_on_click(CustomJS(args=dict(methods=clust_methods,clust_rows=clust_sources[0],
+                                                              clust_cols=clust_sources[1],img_source=image_source),
+                                                    code=image_reorder_js))
 
         toggle.js_on_click(CustomJS(args=dict(plot=upperFig2),code="""
             console.log('toggle: active=' + this.active, this.toString())
@@ -126,6 +199,18 @@ class PredictMap:
 
         """))
 
+        def value_columns(curr_map_dict, curr_pred_map, slider_val, skip_constant=False):
+            # Value columns of pred_ds as arrays, pred_ds.data.update sends only these columns
+            columns = {k:self._mapValues(v, slider_val if k not in constant_map else '0')\
+                       for k,v in map_dict[curr_map_dict].items() if not (skip_constant and k in constant_map)}
+
+            if curr_pred_map in columns:
+                columns['entry_color'] = columns[curr_pred_map]
+            elif curr_pred_map not in constant_map:
+                columns['entry_color'] = self._mapValues(map_dict[curr_map_dict][curr_pred_map], slider_val)
+
+            return columns
+
         def update_predmap_button(attrname, old, new):
 
             # Obtain sampling type and respective slider value
@@ -150,15 +235,18 @@ class PredictMap:
                                                   palette=predmap_palette_dict[curr_pred_map],
                                                   high=map_bounds.data[curr_pred_map][1])
 
-            entry_values = predmap_ds.loc[:,slider_val].values if curr_pred_map not in constant_map else predmap_ds.loc[:,'0'].values
+            entry_values = self._mapValues(predmap_ds, slider_val if curr_pred_map not in constant_map else '0')
             pred_ds.data['entry_color'] = entry_values
+            update_heatmap()
 
             p2.title.text, p3.title.text = '{} Manifold'.format(str.capitalize(curr_pred_map)),\
                                            '{} Heatmap'.format(str.capitalize(curr_pred_map))
 
         radio_button_predmap = RadioButtonGroup(labels=list(map(str.capitalize,predmap_labels)),
-                                               active=predmap_labels_dict[predmap_init_field],max_width=300)
-        predmap_button_updates = radio_button_predmap.on_change('active', update_predmap_button)
+                                               active=predmap_labels_dict[predmap_init_field],max_width=300,
+                                               name='predmap_radio')
+        if not standalone:
+            predmap_button_updates = radio_button_predmap.on_change('active', update_predmap_button)
 
         def update_slider_radio(attrname, old, new):
 
@@ -166,27 +254,19 @@ class PredictMap:
             curr_map_dict = slider_key_dict[new]
             slider_val = str(sample_sliders[curr_map_dict].value)
 
-            try:
-                curr_pred_map = predmap_key_dict[radio_button_predmap.active]
-                predmap_ds = map_dict[curr_map_dict][curr_pred_map]
-
-            except KeyError:
+            curr_pred_map = predmap_key_dict[radio_button_predmap.active]
+            if curr_pred_map not in map_dict[curr_map_dict]:
                 # If prediction type not in current sampling type, reset radio button
                 curr_pred_map = predmap_init_field
-                predmap_ds = map_dict[curr_map_dict][curr_pred_map]
                 radio_button_predmap.active = predmap_labels_dict[predmap_init_field]
 
             # Update data sources and properties
-            # Update pred_df cds
-            entry_values = predmap_ds.loc[:,slider_val].values if curr_pred_map not in constant_map else predmap_ds.loc[:,'0'].values
-            pred_ds.data = pred_df.assign(entry_color=entry_values)\
-                                  .assign(**{k:v.loc[:,slider_val].values if k not in constant_map else v.loc[:,'0'].values for k,v in map_dict[curr_map_dict].items()})
+            # Update pred_df cds, constant maps also change with the sampler
+            pred_ds.data.update(value_columns(curr_map_dict, curr_pred_map, slider_val))
+            update_heatmap()
 
             ########### Update map bounds for slider value
-            map_bounds.data = {k:[np.percentile(v.loc[:,slider_val].values if k not in constant_map else v.loc[:,'0'].values,map_q_low),
-            np.percentile(v.loc[:,slider_val].values if k not in constant_map else v.loc[:,'0'].values,map_q_high)]\
-                          for k,v in map_dict[curr_map_dict].items()}
-            map_bounds.data['prediction'] = [-0.3,0.3]
+            map_bounds.data = slider_bounds(curr_map_dict, slider_val)
 
             # Update colorbar
             predmap_color_bar.color_mapper.update(low=map_bounds.data[curr_pred_map][0],
@@ -208,7 +288,8 @@ class PredictMap:
                                         css_classes=["spaced-radiogroup"],
                                         width=15)
 
-        radio_slider_updates = radio_group_slider.on_change('active', update_slider_radio)
+        if not standalone:
+            radio_slider_updates = radio_group_slider.on_change('active', update_slider_radio)
 
         def update_predmap_slider(attrname, old, new):
 
@@ -216,17 +297,12 @@ class PredictMap:
             curr_pred_map = predmap_key_dict[radio_button_predmap.active]
             slider_val = str(sample_sliders[curr_map_dict].value)
 
-            predmap_ds = map_dict[curr_map_dict][curr_pred_map]
-
-            entry_values = predmap_ds.loc[:,slider_val].values if curr_pred_map not in constant_map else predmap_ds.loc[:,'0'].values
-            pred_ds.data = pred_df.assign(entry_color=entry_values)\
-                                  .assign(**{k:v.loc[:,slider_val].values if k not in constant_map else v.loc[:,'0'].values for k,v in map_dict[curr_map_dict].items()})
+            # Only the per iteration value columns change with the slider
+            pred_ds.data.update(value_columns(curr_map_dict, curr_pred_map, slider_val, skip_constant=True))
+            update_heatmap()
 
             ########### Update map bounds for slider value
-            map_bounds.data = {k:[np.percentile(v.loc[:,slider_val].values if k not in constant_map else v.loc[:,'0'].values,map_q_low),
-            np.percentile(v.loc[:,slider_val].values if k not in constant_map else v.loc[:,'0'].values,map_q_high)]\
-                          for k,v in map_dict[curr_map_dict].items()}
-            map_bounds.data['prediction'] = [-0.3,0.3]
+            map_bounds.data = slider_bounds(curr_map_dict, slider_val)
 
             # Update colorbar
             predmap_color_bar.color_mapper.update(low=map_bounds.data[curr_pred_map][0],
@@ -234,9 +310,6 @@ class PredictMap:
                                                   high=map_bounds.data[curr_pred_map][1])
            ###########
 
-        slider_updates = {sampler:sample_sliders[sampler].on_change('value_throttled', update_predmap_slider)\
-                     for sampler in sample_sliders.keys()}
-
         def toggle_predmap_slider(event):
 
             if event:
@@ -244,10 +317,12 @@ class PredictMap:
             else:
                 update_predmap_slider('value_throttled',active_dim,0)
 
-        data_toggle.on_click(toggle_predmap_slider)
+        if not standalone:
+            slider_updates = {sampler:sample_sliders[sampler].on_change('value_throttled', update_predmap_slider)\
+                         for sampler in sample_sliders.keys()}
+            data_toggle.on_click(toggle_predmap_slider)
 
-        # with open('exploreML/models/active_explore_js/data_toggle.js','r') as f:
-        #     data_toggle_js = f.read()
+        # data_toggle_js = loadJS('data_toggle.js')
         #
         # data_toggle.js_on_click(CustomJS(args=dict(sliders=sample_sliders, active_dim=\
         #                                            1000),
@@ -260,8 +335,62 @@ class PredictMap:
         p2.xaxis.axis_label = "umap 1"
         p2.yaxis.axis_label = "umap 2"
 
-        manifoldFig = p2.scatter(x='x',y='y',source=pred_ds,size=1,
-                                 color={'field':'entry_color', 'transform': predmap_mapper})
+        if manifold_lod is not None and not standalone:
+            # Level of detail, the mirrored half repeats the same points so only the stored half is drawn
+            n_points = len(pred_df) // 2 if is_sym else len(pred_df)
+            point_x, point_y = pred_df['x'].values[:n_points], pred_df['y'].values[:n_points]
+            point_cols = ['x','y','entry_color',row_name,col_name] + [label for label in predmap_labels if label in pred_ds.data]
+
+            manifold_ds = ColumnDataSource({col:[] for col in point_cols})
+            density_source = ColumnDataSource(dict(image=[], x=[], y=[], dw=[], dh=[]))
+
+            p2.x_range = Range1d(np.nanmin(point_x), np.nanmax(point_x))
+            p2.y_range = Range1d(np.nanmin(point_y), np.nanmax(point_y))
+
+            densityFig = p2.image(image='image', x='x', y='y', dw='dw', dh='dh',
+                                  source=density_source, color_mapper=predmap_mapper)
+            manifoldFig = p2.scatter(x='x',y='y',source=manifold_ds,size=1,
+                                     color={'field':'entry_color', 'transform': predmap_mapper})
+
+            p2.add_tools(
+                HoverTool(
+                          tooltips=[('umap', '$x, $y'),('mean value', '@image')],
+                          mode='mouse',
+                          renderers=[densityFig]
+                )
+            )
+
+            def update_manifold(x0=None, x1=None, y0=None, y1=None):
+                x0, x1 = p2.x_range.start if x0 is None else x0, p2.x_range.end if x1 is None else x1
+                y0, y1 = p2.y_range.start if y0 is None else y0, p2.y_range.end if y1 is None else y1
+
+                visible = (point_x >= x0) & (point_x <= x1) & (point_y >= y0) & (point_y <= y1)
+                entry_color = np.asarray(pred_ds.data['entry_color'], dtype=float)[:n_points]
+
+                if visible.sum() > manifold_lod:
+                    # Mean entry color per grid cell, histogram2d bins are [x, y] while images are [y, x]
+                    colored = visible & np.isfinite(entry_color)
+                    grid_range = [[x0, x1], [y0, y1]]
+                    counts, _, _ = np.histogram2d(point_x[colored], point_y[colored], bins=manifold_bins, range=grid_range)
+                    sums, _, _ = np.histogram2d(point_x[colored], point_y[colored], bins=manifold_bins, range=grid_range,
+                                                weights=entry_color[colored])
+                    with np.errstate(invalid='ignore'):
+                        grid = (sums / counts).T.astype(np.float32)
+
+                    density_source.data = dict(image=[grid], x=[x0], y=[y0], dw=[x1 - x0], dh=[y1 - y0])
+                    manifold_ds.data = {col:[] for col in point_cols}
+                else:
+                    density_source.data = dict(image=[], x=[], y=[], dw=[], dh=[])
+                    manifold_ds.data = {col:np.asarray(pred_ds.data[col])[:n_points][visible] for col in point_cols}
+
+            def update_manifold_range(event):
+                update_manifold(event.x0, event.x1, event.y0, event.y1)
+
+            update_manifold()
+            p2.on_event(RangesUpdate, update_manifold_range)
+        else:
+            manifoldFig = p2.scatter(x='x',y='y',source=pred_ds,size=1,
+                                     color={'field':'entry_color', 'transform': predmap_mapper})
 
         p2.add_tools(
             HoverTool(
@@ -271,6 +400,36 @@ class PredictMap:
             )
         )
 
+        if standalone:
+            # Every (sampler, map, iteration) column is embedded once, the callback swaps them into pred_ds
+            # Constant maps only ever show iteration '0', so only that column is embedded
+            predmap_callback_js = loadJS('predmap_callback.js')
+
+            with profiler.stage('pack_maps'):
+                packed_maps = ColumnDataSource(self._packMaps(map_dict, constant_map))
+
+            predmap_callback = CustomJS(args=dict(pred_ds=pred_ds, maps=packed_maps,
+                                                  map_iters={sampler:{k:['0'] if k in constant_map else list(self._storedColumns(v))\
+                                                                      for k,v in maps.items()}\
+                                                             for sampler,maps in map_dict.items()},
+                                                  map_bounds={sampler:{k:(v.loc[:,['0']] if k in constant_map else v).to_dict(orient='list')\
+                                                                       for k,v in bounds.items()}\
+                                                              for sampler,bounds in bounds_table.items()},
+                                                  fixed_bounds={'prediction':[-0.3,0.3]},
+                                                  samplers=list(sample_sliders.keys()), sliders=sample_sliders,
+                                                  predmap_labels=predmap_labels, init_field=predmap_init_field,
+                                                  constant_map=constant_map, is_sym=is_sym,
+                                                  radio_sampler=radio_group_slider, radio_map=radio_button_predmap,
+                                                  color_mapper=predmap_mapper, palettes=predmap_palette_dict,
+                                                  manifold_plot=p2, heatmap_plot=p3,
+                                                  img_source=image_source if heatmap_renderer == 'image' else None),
+                                        code=predmap_callback_js)
+
+            radio_button_predmap.js_on_change('active', predmap_callback)
+            radio_group_slider.js_on_change('active', predmap_callback)
+            for slider in sample_sliders.values():
+                slider.js_on_change('value', predmap_callback)
+
         toolbar.children.append(radio_button_predmap)
         toolbar.children[2] = row(radio_group_slider,toolbar.children[2])
         for child in toolbar.select_one({'name':'slider_col'}).children:
@@ -279,6 +438,53 @@ class PredictMap:
 
         self.layout = layout
 
+    def _packMaps(self, map_dict, constant_map=()):
+        """
+        Every stored map column as a float32 array, keyed by sampler|map|iteration
+        Constant maps only pack iteration '0', keyed by sampler|map
+        """
+        packed = {}
+        for sampler,maps in map_dict.items():
+            for k,v in maps.items():
+                if k in constant_map:
+                    packed['{}|{}'.format(sampler, k)] = self._mapColumn(v, '0').astype(np.float32)
+                    continue
+                packed.update({'{}|{}|{}'.format(sampler, k, col):self._mapColumn(v, col).astype(np.float32)\
+                               for col in self._storedColumns(v)})
+
+        return packed
+
+    def _storedColumns(self, df):
+        """
+        Iteration columns held by a map, only the kept ones of a snapshot
+        """
+        if isinstance(df, SnapshotFrame):
+            return df.kept_columns
+        return df.columns
+
+    def _mapColumn(self, df, col):
+        if isinstance(df, SnapshotFrame):
+            return df.column(col)
+        return df.loc[:,col].values
+
+    def _mapPercentiles(self, df, q):
+        """
+        Percentiles of every iteration column of a map, one row per percentile
+        """
+        if isinstance(df, SnapshotFrame):
+            return df.percentiles(q)
+        return pd.DataFrame(np.percentile(df.values,q,axis=0),columns=df.columns)
+
+    def _mapValues(self, df, col):
+        """
+        Values of a map column for every entry of pred_df, repeated for the mirrored half when symmetric
+        """
+        values = self._mapColumn(df, col)
+        if self.is_sym:
+            values = np.concatenate([values, values])
+
+        return values
+
     def _addSym(self, df, change_col=True, ignore_index=True):
 
         if change_col:
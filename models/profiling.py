@@ -0,0 +1,116 @@
+import io
+import time
+import cProfile
+import pstats
+import tracemalloc
+import pandas as pd
+from contextlib import contextmanager
+
+class BuildProfiler:
+
+    """
+    Wall time and peak memory of the build stages of ActiveExplore, PredictMap and ExploreML
+
+    Args:
+    enabled: record the stages, a disabled profiler only runs them
+    cprofile: also run cProfile over the outermost stages, see stats()
+    trace_memory: track the peak memory of every stage with tracemalloc (slows the build down)
+    """
+
+    def __init__(self, enabled=True, cprofile=False, trace_memory=True):
+
+        self.enabled = enabled
+        self.trace_memory = trace_memory
+        self.records = []
+        self.profile = cProfile.Profile() if cprofile else None
+
+        self._names = []
+        self._peaks = [] # [memory at stage start, peak memory seen by nested stages]
+        self._started_tracing = False
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Record a build stage, nested stages are reported as outer/inner
+        """
+        if not self.enabled:
+            yield
+            return
+
+        if not self._names:
+            if self.trace_memory and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            if self.profile is not None:
+                self.profile.enable()
+
+        self._names.append(name)
+        self._enterMemory()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.records.append(dict(stage='/'.join(self._names), seconds=seconds, peak_bytes=self._exitMemory()))
+            self._names.pop()
+
+            if not self._names:
+                if self.profile is not None:
+                    self.profile.disable()
+                if self._started_tracing:
+                    tracemalloc.stop()
+                    self._started_tracing = False
+
+    def report(self):
+        """
+        Dataframe of the stages with their calls, total seconds and largest peak memory in MB, in the order they finished
+        """
+        if not self.records:
+            return pd.DataFrame(columns=['calls','seconds','peak_mb'])
+
+        records = pd.DataFrame(self.records)
+        report = records.groupby('stage', sort=False).agg(calls=('seconds','size'), seconds=('seconds','sum'),
+                                                           peak_mb=('peak_bytes','max'))
+        report['peak_mb'] = report['peak_mb'] / 2**20
+
+        return report
+
+    def stats(self, sort='cumulative', limit=30):
+        """
+        cProfile statistics of the profiled stages as text
+        """
+        if self.profile is None:
+            return ''
+
+        out = io.StringIO()
+        pstats.Stats(self.profile, stream=out).sort_stats(sort).print_stats(limit)
+
+        return out.getvalue()
+
+    def dump_stats(self, fname):
+        """
+        Save the cProfile statistics, e.g. for snakeviz
+        """
+        if self.profile is not None:
+            self.profile.dump_stats(fname)
+
+    def _enterMemory(self):
+        if not tracemalloc.is_tracing():
+            return
+
+        current, peak = tracemalloc.get_traced_memory()
+        if self._peaks:
+            self._peaks[-1][1] = max(self._peaks[-1][1], peak)
+        tracemalloc.reset_peak()
+        self._peaks.append([current, current])
+
+    def _exitMemory(self):
+        if not self._peaks:
+            return float('nan')
+
+        start, nested_peak = self._peaks.pop()
+        peak = max(tracemalloc.get_traced_memory()[1], nested_peak) if tracemalloc.is_tracing() else nested_peak
+        if self._peaks:
+            self._peaks[-1][1] = max(self._peaks[-1][1], peak)
+
+        return peak - start
@@ -0,0 +1,57 @@
+import hashlib
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+class SourceRegistry:
+
+    """
+    Content addressed registry of the sources and cluster orderings shared by the panels of one document
+    Only sources that no callback mutates should be registered, every panel reads the same instance
+    """
+
+    def __init__(self):
+
+        self._items = {}
+        self.hits = 0
+
+    def key(self, kind, parts):
+        """
+        Hash of the kind and the contents of every part
+        """
+        h = hashlib.sha1(kind.encode())
+        for part in parts:
+            h.update(b'\x00')
+            h.update(self._hashPart(part))
+
+        return h.hexdigest()
+
+    def get(self, kind, parts, factory):
+        """
+        Registered item with identical contents, made with factory() when missing
+        """
+        key = self.key(kind, parts)
+        if key in self._items:
+            self.hits += 1
+        else:
+            self._items[key] = factory()
+
+        return self._items[key]
+
+    def __len__(self):
+        return len(self._items)
+
+    def _hashPart(self, part):
+        if isinstance(part, (pd.DataFrame, pd.Series, pd.Index)):
+            h = hashlib.sha1(pd.util.hash_pandas_object(part).values.tobytes())
+            if isinstance(part, pd.DataFrame):
+                h.update(repr((part.columns.tolist(), part.dtypes.astype(str).tolist())).encode())
+            return h.digest()
+        elif sparse.issparse(part):
+            part = part.tocsr()
+            return b''.join(self._hashPart(array) for array in [np.array(part.shape), part.indptr, part.indices, part.data])
+        elif isinstance(part, np.ndarray):
+            part = np.ascontiguousarray(part)
+            return hashlib.sha1(repr((part.dtype.str, part.shape)).encode() + part.tobytes()).digest()
+
+        return repr(part).encode()
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+class SnapshotFrame:
+
+    """
+    Compressed stand-in for a predmap_dict frame with one column per active learning iteration
+
+    Args:
+    df: dataframe of map values, one column per iteration (slider step)
+    dtype: storage of the kept columns, 'uint8' (quantized with a per column scale/offset), 'float16' or 'float32'
+    stride: keep every stride-th column (and the last), the others are linearly interpolated on demand
+    """
+
+    _nan_code = 255
+
+    def __init__(self, df, dtype='uint8', stride=1):
+
+        self.columns = df.columns
+        self.dtype = dtype
+        self.stride = stride
+
+        kept = list(range(0, len(df.columns), stride))
+        if kept[-1] != len(df.columns) - 1:
+            kept.append(len(df.columns) - 1)
+        self.kept = np.array(kept)
+        self.kept_columns = df.columns[self.kept]
+
+        values = df.iloc[:, self.kept].values.astype(np.float64)
+
+        if dtype == 'uint8':
+            # Codes 0-254 span each column's range, 255 marks missing values
+            self.offset = np.nanmin(values, axis=0)
+            span = np.nanmax(values, axis=0) - self.offset
+            self.scale = np.where(span > 0, span / (self._nan_code - 1), 1.0)
+
+            codes = np.round((values - self.offset) / self.scale)
+            self.data = np.where(np.isnan(values), self._nan_code, codes).astype(np.uint8)
+        elif dtype in ('float16', 'float32'):
+            self.data = values.astype(dtype)
+        else:
+            raise ValueError('Invalid snapshot dtype given: {}'.format(dtype))
+
+    @property
+    def shape(self):
+        return (self.data.shape[0], len(self.columns))
+
+    @property
+    def values(self):
+        """
+        Decompressed kept columns
+        """
+        return self._decode(np.arange(len(self.kept)))
+
+    def column(self, col):
+        """
+        Values of an iteration column, interpolated between the nearest kept columns when not stored
+        """
+        pos = self.columns.get_loc(col)
+        right = np.searchsorted(self.kept, pos)
+
+        if self.kept[right] == pos:
+            return self._decode(right)
+
+        left = right - 1
+        weight = (pos - self.kept[left]) / (self.kept[right] - self.kept[left])
+
+        return (1 - weight) * self._decode(left) + weight * self._decode(right)
+
+    def percentiles(self, q):
+        """
+        Percentiles of every iteration column, interpolated like the values for the columns not stored
+        """
+        kept_percentiles = np.percentile(self.values, q, axis=0)
+        all_percentiles = [np.interp(np.arange(len(self.columns)), self.kept, row) for row in np.atleast_2d(kept_percentiles)]
+
+        return pd.DataFrame(all_percentiles, columns=self.columns)
+
+    def _decode(self, idx):
+        data = self.data[:, idx]
+
+        if self.dtype == 'uint8':
+            decoded = data * self.scale[idx] + self.offset[idx]
+            return np.where(data == self._nan_code, np.nan, decoded).astype(np.float32)
+
+        return data.astype(np.float32)
+
+def compressSnapshots(predmap_dict, dtype='uint8', stride=1):
+    """
+    predmap_dict with every frame replaced by a SnapshotFrame, drop the original to free its memory
+    """
+    return {sampler:{k:v if isinstance(v, SnapshotFrame) else SnapshotFrame(v, dtype, stride) for k,v in maps.items()}\
+            for sampler,maps in predmap_dict.items()}
@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+
+class ColumnStats:
+
+    """
+    Streaming count/mean/variance/min/max of the numeric columns of sampler frames
+    Chunks and samplers are combined with merge, so new rows only need a pass over themselves
+
+    Args:
+    columns: numeric column names
+    """
+
+    def __init__(self, columns):
+
+        self.columns = list(columns)
+        n = len(self.columns)
+        self.count = np.zeros(n)
+        self.mean = np.zeros(n)
+        self.m2 = np.zeros(n)
+        self.min = np.full(n, np.nan)
+        self.max = np.full(n, np.nan)
+        self.rows = 0
+
+    @classmethod
+    def fromFrame(cls, df, chunk_size=1000000):
+        """
+        Statistics of the numeric columns of a frame, read in row chunks
+        """
+        stats = cls(df.select_dtypes(include='number').columns)
+        for start in range(0, df.shape[0], chunk_size):
+            stats.update(df.iloc[start:start+chunk_size])
+
+        return stats
+
+    def update(self, df):
+        """
+        Add the rows of a frame
+        """
+        chunk = ColumnStats(self.columns)
+        values = df.loc[:, self.columns].values.astype(float)
+        observed = ~np.isnan(values)
+
+        chunk.count = observed.sum(axis=0).astype(float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            chunk.mean = np.where(chunk.count > 0, np.nansum(values, axis=0) / chunk.count, 0)
+        chunk.m2 = np.nansum((values - chunk.mean)**2, axis=0)
+        chunk.min = np.fmin.reduce(values, axis=0) if values.shape[0] else chunk.min
+        chunk.max = np.fmax.reduce(values, axis=0) if values.shape[0] else chunk.max
+        chunk.rows = values.shape[0]
+
+        self.merge(chunk)
+
+        return self
+
+    def merge(self, other):
+        """
+        Combine with the statistics of other rows (parallel variance update)
+        """
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.mean = np.where(count > 0, self.mean + delta * other.count / count, 0)
+            self.m2 = self.m2 + other.m2 + np.where(count > 0, delta**2 * self.count * other.count / count, 0)
+        self.count = count
+        self.min = np.fmin(self.min, other.min)
+        self.max = np.fmax(self.max, other.max)
+        self.rows = self.rows + other.rows
+
+        return self
+
+    def mirrored(self, row_col, col_col):
+        """
+        Statistics of the symmetric expansion, every row followed by a copy with row_col and col_col swapped
+        """
+        swapped = ColumnStats(self.columns).merge(self)
+        i, j = self.columns.index(row_col), self.columns.index(col_col)
+        for name in ['count', 'mean', 'm2', 'min', 'max']:
+            values = getattr(swapped, name)
+            values[[i, j]] = values[[j, i]]
+
+        return ColumnStats(self.columns).merge(self).merge(swapped)
+
+    def state(self):
+        """
+        JSON serialisable state, stored with the sampler frames by saveActiveH5 and saveActiveParquet
+        """
+        return dict(columns=[str(col) for col in self.columns], rows=int(self.rows),
+                    **{name:getattr(self, name).tolist() for name in ['count', 'mean', 'm2', 'min', 'max']})
+
+    @classmethod
+    def fromState(cls, state):
+        stats = cls(state['columns'])
+        stats.rows = state['rows']
+        for name in ['count', 'mean', 'm2', 'min', 'max']:
+            setattr(stats, name, np.array(state[name], dtype=float))
+
+        return stats
+
+    @property
+    def std(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > 1, np.sqrt(self.m2 / (self.count - 1)), np.nan)
+
+    def meta(self):
+        """
+        {column: {'min', 'max'}} axis metadata of the line plots
+        """
+        return {col:{'min':float(lo), 'max':float(hi)} for col,lo,hi in zip(self.columns, self.min, self.max)}
+
+    def varying(self):
+        """
+        Columns with a positive standard deviation
+        """
+        return [col for col,std in zip(self.columns, self.std) if std > 0]
+
+    def frame(self):
+        return pd.DataFrame(dict(count=self.count, mean=self.mean, std=self.std, min=self.min, max=self.max),
+                            index=self.columns)
+
+def mergeStats(stats):
+    """
+    Combined statistics of several ColumnStats over the same columns
+    """
+    stats = list(stats)
+    merged = ColumnStats(stats[0].columns)
+    for s in stats:
+        merged.merge(s)
+
+    return merged
@@ -0,0 +1,145 @@
+import os
+import numpy as np
+import pandas as pd
+from bokeh.models import CustomJSTransform, CustomJSHover
+from bokeh.transform import transform
+from functools import lru_cache
+
+js_dir = os.path.join(os.path.dirname(__file__), 'active_explore_js')
+
+@lru_cache(maxsize=None)
+def loadJS(name):
+    """
+    Source of a callback in active_explore_js, read once per process relative to the package
+    """
+    with open(os.path.join(js_dir, name), 'r') as f:
+        return f.read()
+
+decode_factors_js = """
+const labels = new Array(xs.length);
+for (let i = 0; i < xs.length; i++) {
+  labels[i] = factors[xs[i]];
+}
+return labels;
+"""
+
+def compactArray(values):
+    """
+    Smallest binary serializable dtype that holds the values losslessly
+    """
+    values = np.asarray(values)
+    kind = values.dtype.kind
+
+    if kind == 'b':
+        return values.astype(np.uint8)
+    elif kind in 'iu':
+        if values.size == 0 or (values.min() >= np.iinfo(np.int32).min and values.max() <= np.iinfo(np.int32).max):
+            return values.astype(np.int32)
+    elif kind == 'f' and values.dtype != np.float32:
+        compact = values.astype(np.float32)
+        if np.array_equal(compact, values, equal_nan=True):
+            return compact
+    elif kind == 'O':
+        return values.tolist()
+
+    return values
+
+def encodeSourceData(df, encoding='list', factor_tables=None):
+    """
+    ColumnDataSource data for a dataframe
+    encoding: 'list' for JSON lists, 'binary' for typed arrays with label columns as factor codes
+    factor_tables: dictionary of label column and factor list, used for the factor codes
+    """
+    if encoding == 'list':
+        return df.to_dict(orient='list')
+    elif encoding != 'binary':
+        raise ValueError('Invalid encoding given: {}'.format(encoding))
+
+    factor_tables = factor_tables or {}
+    data = {}
+    for col in df.columns:
+        if col in factor_tables:
+            data[col] = pd.Categorical(df[col], categories=factor_tables[col]).codes.astype(np.int32)
+        else:
+            data[col] = compactArray(df[col].values)
+
+    return data
+
+def makeFactorTransforms(factor_tables):
+    """
+    CustomJSTransforms mapping factor codes back to their labels on the browser side
+    """
+    return {col:CustomJSTransform(args=dict(factors=list(factors)),
+                                  func="return factors[x];", v_func=decode_factors_js)\
+            for col,factors in factor_tables.items()}
+
+def factorField(col, factor_transforms):
+    """
+    Glyph coordinate spec for a label column, decoded when it holds factor codes
+    """
+    if col in factor_transforms:
+        return transform(col, factor_transforms[col])
+    return col
+
+def factorTooltip(col, factor_transforms):
+    """
+    Hover field for a label column, decoded when it holds factor codes
+    """
+    if col in factor_transforms:
+        return '@{%s}{custom}' % col
+    return '@{%s}' % col
+
+def factorFormatters(factor_transforms):
+    """
+    Hover formatters for the label columns that hold factor codes
+    """
+    return {'@{%s}' % col:CustomJSHover(args=dict(decoder=tf), code="return decoder.compute(value);")\
+            for col,tf in factor_transforms.items()}
+
+def makeImageData(values, row_idx, col_idx):
+    """
+    Image source data of a matrix in cluster order
+    Rows are stacked bottom to top to match the reversed y range of the heatmaps
+    """
+    row_order = np.ascontiguousarray(np.asarray(row_idx, dtype=np.int32)[::-1])
+    col_order = np.asarray(col_idx, dtype=np.int32)
+    image = np.asarray(values, dtype=np.float32)[np.ix_(row_order, col_order)]
+
+    return dict(image=[image], row_order=[row_order], col_order=[col_order])
+
+def makeUpperMask(n_rows, n_cols):
+    """
+    Patch over the entries above the diagonal of the displayed matrix, in factor range coordinates
+    The mask only depends on the matrix shape, so it stays in place when the cluster ordering changes
+    """
+    k = min(n_rows, n_cols - 1)
+    x, y = [n_cols, n_cols], [n_rows, n_rows - k]
+
+    # Staircase along the diagonal, from the lowest masked row up to the top row
+    for r in range(k - 1, -1, -1):
+        x += [r + 1, r + 1]
+        y += [n_rows - 1 - r, n_rows - r]
+
+    return dict(x=x, y=y)
+
+def makeClustData(clust_dict):
+    """
+    Row and column source data of the cluster orderings, '<method>|index' positions and '<method>|labels'
+    Callbacks read them from two shared sources instead of each embedding its own copy of clust_dict
+    """
+    row_data, col_data = {}, {}
+    for method, (row_index, col_index, row_labels, col_labels) in clust_dict.items():
+        row_data[method + '|index'] = np.asarray(row_index, dtype=np.int32)
+        row_data[method + '|labels'] = list(row_labels)
+        col_data[method + '|index'] = np.asarray(col_index, dtype=np.int32)
+        col_data[method + '|labels'] = list(col_labels)
+
+    return row_data, col_data
+
+def rangeFormatters(plot):
+    """
+    Hover formatters mapping $x/$y positions on factor ranges to the labels under the cursor
+    """
+    code = "return rng.factors[Math.floor(value)];"
+    return {'$x':CustomJSHover(args=dict(rng=plot.x_range), code=code),
+            '$y':CustomJSHover(args=dict(rng=plot.y_range), code=code)}